@@ -15,13 +15,23 @@ After getting an answer, the answer will be added to the commands_list object af
 
 import netCDF_file_handler as nfh
 from functools import partial
-import safer_prompt_toolkit
 from typing import List, Optional, Callable
-import extra_prompt_toolkit_utilities as eptu
+
+# safer_prompt_toolkit and extra_prompt_toolkit_utilities import prompt_toolkit, which takes a while, so they are imported
+# only by the functions that ask questions. jobs and the netCDF inspection helpers never import them
 
 # initialising to False. if True, then the program knows that it reads from a file and will not create user interface
 is_reading_from_file = False
 
+# if True, the map questions also ask for the corners of the map. It is False by default, so the answer scripts made
+# without the question keep the order of their answers
+is_asking_map_corners = False
+
+# explaining how to answer with a few indexes, to make a figure for every one of them
+index_list_explanation = "To make a figure for every one of a few values, enter their indexes separated by commas " \
+                         "(for example: 0,4,8),\nor a range of indexes as start:stop or start:stop:step (for " \
+                         "example: 0:124:4)."
+
 
 # a class that contains the basic commands
 class CommandsList:
@@ -35,6 +45,8 @@ class CommandsList:
     fig_location: Optional[str]  # the address of the fig on the computer
     current_time_value: Optional[int]  # the time value of this current fig
     current_depth_value: Optional[int]  # the depth value of this current fig
+    time_values: Optional[List[int]]  # the time values of all the figs, if more than one fig is made in the run
+    depth_values: Optional[List[int]]  # the depth values of all the figs, if more than one fig is made in the run
 
     # TODO fill value function
 
@@ -49,6 +61,8 @@ class CommandsList:
         self.fig_location = None
         self.current_time_value = 0
         self.current_depth_value = 0
+        self.time_values = None
+        self.depth_values = None
 
 
 # a class that contains the commands to create a map
@@ -80,6 +94,10 @@ class MapCommandsList(CommandsList):
     lat_upper_right_corner: Optional[float]  # urcrnrlat
     resolution: Optional[str]
     projection: Optional[str]  # type of of projection of the map
+    is_full_resolution: Optional[bool]  # draw every grid point, even if there are more of them than pixels
+
+    map_domain: Optional[nfh.MapDomain]  # the part of the grid the map shows and its level of detail, from the map base
+    map_properties: Optional[dict]  # the keywords of the map base's Basemap, from the map base
 
     # TODO create defaults for lon_min and lat_min etc after finding lon and lat
 
@@ -95,6 +113,8 @@ class MapCommandsList(CommandsList):
             self.fig_location = args[0].fig_location
             self.current_time_value = args[0].current_time_value
             self.current_depth_value = args[0].current_depth_value
+            self.time_values = args[0].time_values
+            self.depth_values = args[0].depth_values
 
         elif len(args) == 0:
             super().__init__()
@@ -126,6 +146,10 @@ class MapCommandsList(CommandsList):
         self.lat_upper_right_corner = None
         self.resolution = 'c'
         self.projection = 'gall'
+        self.is_full_resolution = False
+
+        self.map_domain = None
+        self.map_properties = None
 
 
 class GraphCommandsList(CommandsList):
@@ -133,6 +157,11 @@ class GraphCommandsList(CommandsList):
     y_axis: Optional[int]
     time: Optional[int]
     depth: Optional[int]
+    lat: Optional[int]  # latitude
+    lon: Optional[int]  # longitude
+    lat_values: Optional[List[int]]  # the latitude indexes of the points the lines are taken at
+    lon_values: Optional[List[int]]  # the longitude indexes of the points the lines are taken at
+    reduction: Optional[int]  # (0 - a line for every point, 1 - area mean, 2 - monthly climatology of the area mean)
     is_depends_on_time: Optional[bool]  # is the data field depends on time
     is_depends_on_depth: Optional[bool]  # is the data field depends on depth
 
@@ -154,6 +183,8 @@ class GraphCommandsList(CommandsList):
             self.fig_location = args[0].fig_location
             self.current_time_value = args[0].current_time_value
             self.current_depth_value = args[0].current_depth_value
+            self.time_values = args[0].time_values
+            self.depth_values = args[0].depth_values
 
         elif len(args) == 0:
             super().__init__()
@@ -163,6 +194,11 @@ class GraphCommandsList(CommandsList):
         self.y_axis = None
         self.time = None
         self.depth = None
+        self.lat = None
+        self.lon = None
+        self.lat_values = [0]
+        self.lon_values = [0]
+        self.reduction = 0
         self.is_depends_on_time = None
         self.is_depends_on_depth = None
 
@@ -352,15 +388,50 @@ def get_map_choose_parameters(netcdf_file, script, commands_list: MapCommandsLis
 
         # asking for the index of the time they want in the depth array
         get_depth(netcdf_file, script, commands_list)
+
+    # asking for the corners of the map, only if they were asked for
+    if is_asking_map_corners:
+        get_map_corners(script, commands_list)
+    return commands_list
+
+
+def get_map_corners(script, commands_list: MapCommandsList):
+    """
+    :param script: a list with the user's raw answers, by order
+    :param commands_list:  a MapCommandsList object  that can be filled with somewhat processed answers to the
+    questions.
+    :return: commands_list
+
+    about: asking the user for the corners of the part of the grid the map shows. Only the part between the corners is
+    read from the netCDF file. It is asked only when is_asking_map_corners is True.
+    """
+    corners = send_query_corners("please enter the corners of the map as lon_min,lat_min,lon_max,lat_max in "
+                                 "degrees (for example: -20,30,40,60).\nA map can cross the dateline, "
+                                 "for example: 170,-50,-170,-30", script, commands_list)
+    commands_list.lon_lower_left_corner, commands_list.lat_lower_left_corner, \
+        commands_list.lon_upper_right_corner, commands_list.lat_upper_right_corner = corners
     return commands_list
 
 
 def get_graph_choose_parameters(netcdf_file, script, commands_list: GraphCommandsList):
+    """
+    :param netcdf_file: the netCDF file
+    :param script: a list with the user's raw answers, by order
+    :param commands_list:  a GraphCommandsList object that can be filled with somewhat processed answers to the
+    questions. contains fields specific to graph building.
+    :return: commands_list
+
+    about: one of the x and y axes is the coordinate the graph's lines go along (time, depth, latitude or longitude),
+    and the other is the data field. For every other dimension of the data field, the user chooses the indexes the
+    lines are taken at. A line is drawn for every combination of the chosen indexes, or, for lines along the time, the
+    chosen latitude and longitude indexes are the region of an area mean.
+    """
     print_labels_list_and_explanation(commands_list)
     x_axis = send_query("What is the x axis?", range(len(commands_list.info_list)), script, commands_list)
     commands_list.x_axis = int(x_axis)
     y_axis = send_query("What is the y axis?", range(len(commands_list.info_list)), script, commands_list)
     commands_list.y_axis = int(y_axis)
+    axes_labels = [commands_list.x_axis, commands_list.y_axis]
 
     print("the fields", str(commands_list.info_list[int(x_axis)]), ",", str(commands_list.info_list[int(y_axis)]),
           "have the following dimensions:")
@@ -374,7 +445,9 @@ def get_graph_choose_parameters(netcdf_file, script, commands_list: GraphCommand
         print_labels_list(commands_list)
         time = send_query("what is the time label?", range(len(commands_list.info_list)), script, commands_list)
         commands_list.time = int(time)
-        get_time(netcdf_file, script, commands_list)
+        # the time index is asked only if the lines don't go along the time
+        if commands_list.time not in axes_labels:
+            get_time(netcdf_file, script, commands_list)
     is_depends_on_depth = send_query("is one of the above dimensions is depth?\n    (0)NO   (1)YES\n", [0, 1], script,
                                      commands_list)
     commands_list.is_depends_on_depth = (is_depends_on_depth == str(1))
@@ -384,7 +457,48 @@ def get_graph_choose_parameters(netcdf_file, script, commands_list: GraphCommand
         depth = send_query("what is the depth/height label?", range(len(commands_list.info_list)), script,
                            commands_list)
         commands_list.depth = int(depth)
-        get_depth(netcdf_file, script, commands_list)
+        # the depth index is asked only if the lines don't go along the depth
+        if commands_list.depth not in axes_labels:
+            get_depth(netcdf_file, script, commands_list)
+
+    # lines along the time can be reduced to the statistics of the points' area
+    if commands_list.is_depends_on_time and commands_list.time in axes_labels:
+        reduction = send_query("Select the kind of graph:\n0) a line for every point\n1) the area mean of the points' "
+                               "region, with its min-max and percentiles envelopes\n2) the monthly climatology of the "
+                               "area mean\n", [0, 1, 2], script, commands_list)
+        commands_list.reduction = int(reduction)
+
+    # asking for the latitude and longitude labels, and the indexes of the points the lines are taken at
+    print("Select from the following list:")
+    print_labels_list(commands_list)
+    lat = send_query("what is the latitude?", range(len(commands_list.info_list)), script, commands_list)
+    lon = send_query("what is the longitude?", range(len(commands_list.info_list)), script, commands_list)
+    commands_list.lat = int(lat)
+    commands_list.lon = int(lon)
+    if commands_list.lat not in axes_labels:
+        commands_list.lat_values = get_point_index_list(netcdf_file, script, commands_list, commands_list.lat)
+    if commands_list.lon not in axes_labels:
+        commands_list.lon_values = get_point_index_list(netcdf_file, script, commands_list, commands_list.lon)
+    return commands_list
+
+
+def get_point_index_list(netcdf_file, script, commands_list, label):
+    """
+    :param netcdf_file: the netCDF file
+    :param script: a list with the user's raw answers, by order
+    :param commands_list:  an object  that can be filled with somewhat processed answers to the
+    questions.
+    :param label: the index in info_list of the coordinate (latitude or longitude)
+    :return: a list of the chosen indexes in the coordinate
+
+    about: asking for the indexes of the points the graph's lines are taken at, in a latitude or longitude vector
+    """
+    vector_size = nfh.get_metadata_index(netcdf_file)["variables"][commands_list.info_list[label]]["size"]
+    question = "The " + commands_list.info_list[label] + " object have the size of " + str(vector_size) + \
+               ". please select the index of the point you want from 0 to " + str(vector_size - 1) + ".\n" + \
+               "To draw a line for every one of a few points, enter their indexes separated by commas " \
+               "(for example: 0,4,8),\nor a range of indexes as start:stop or start:stop:step (for example: 0:10:2)."
+    return send_query_index_list(question, vector_size, script, commands_list)
 
 
 def get_time(netcdf_file, script, commands_list):
@@ -396,7 +510,8 @@ def get_time(netcdf_file, script, commands_list):
     questions.
     :return: commands_list
 
-    about: asking for the index of the time they want in the time array
+    about: asking for the index of the time they want in the time array. A few indexes can be given to make a figure
+    for every one of them.
     """
 
     # getting the size of the time vector
@@ -404,11 +519,13 @@ def get_time(netcdf_file, script, commands_list):
     if time_vector_size > 1:
         question = "The time object have the size of " + str(time_vector_size) + ". please select the index of the " \
                                                                                  "time value you want from 0 to " + \
-                   str(time_vector_size - 1) + "."
+                   str(time_vector_size - 1) + ".\n" + index_list_explanation
 
         # asking the user
-        current_time_value = send_query(question, range(time_vector_size), script, commands_list)
-        commands_list.current_time_value = int(current_time_value)
+        time_values = send_query_index_list(question, time_vector_size, script, commands_list)
+        commands_list.current_time_value = time_values[0]
+        if len(time_values) > 1:
+            commands_list.time_values = time_values
         return commands_list
 
 
@@ -421,18 +538,21 @@ def get_depth(netcdf_file, script, commands_list):
     questions.
     :return: commands_list
 
-    about: asking for the index of the time they want in the depth array
+    about: asking for the index of the time they want in the depth array. A few indexes can be given to make a figure
+    for every one of them.
     """
     # getting the size of the depth vector
     depth_vector_size = nfh.get_depth_vector_size(netcdf_file, commands_list)
     if depth_vector_size > 1:
         question = "The depth object have the size of " + str(depth_vector_size) + ". please select the index of the " \
                                                                                    "depth value you want from 0 to " + \
-                   str(depth_vector_size - 1) + "."
+                   str(depth_vector_size - 1) + ".\n" + index_list_explanation
 
         # asking the user
-        current_depth_value = send_query(question, range(depth_vector_size), script, commands_list)
-        commands_list.current_depth_value = int(current_depth_value)
+        depth_values = send_query_index_list(question, depth_vector_size, script, commands_list)
+        commands_list.current_depth_value = depth_values[0]
+        if len(depth_values) > 1:
+            commands_list.depth_values = depth_values
         return commands_list
 
 
@@ -444,10 +564,12 @@ def get_plot_name_location_and_format(script, commands_list):
 
     about: getting the plot's full address and name
     """
+    import safer_prompt_toolkit
+    import extra_prompt_toolkit_utilities as eptu
 
     # asking fot the figure's format, creating an interface for the Terminal that suggest answers for this question
     completer, validator = eptu.make_ConstantOptions_Completer_and_Validator(
-        ["pdf", "png", "jpg", "jpeg", "pickle", "eps", "ps", "svg"])
+        ["pdf", "png", "jpg", "jpeg", "pickle", "npz", "eps", "ps", "svg", "gif", "apng", "mp4"])
     fig_format = safer_prompt_toolkit.prompt("Select the figures format:\n", completer=completer, validator=validator,
                                              force_fail_safe=is_reading_from_file)
     fig_format = str(fig_format)
@@ -544,24 +666,68 @@ def send_query(question, possible_answers, script, commands_list):
 
     about: asking the user for input and validating it
     """
-
     # creating the possible_answer_string and converting every element in it to a string
     possible_answer_string = [str(a) for a in possible_answers]
     possible_answer_string = possible_answer_string + ['ll', 'banana?', 'turtle']
 
     # making a partial function object the validator will call to
     partial_validate_answer: Callable[[str], bool] = partial(validate_answer, possible_answer_string)
+    return send_validated_query(question, partial_validate_answer, script, commands_list)
+
+
+def send_query_index_list(question, vector_size, script, commands_list):
+    """
+    :param question: a string, the question the program will print
+    :param vector_size: the size of the vector the indexes are taken from
+    :param script: a list with the user's raw answers, by order
+    :param commands_list: an object that can contains all the information we need to build the figure.
+    :return: a list of the indexes in the user's answer
+
+    about: asking the user for one index or a few indexes of a vector, and validating them
+    """
+    # making a partial function object the validator will call to
+    partial_validate_index_list_answer: Callable[[str], bool] = partial(validate_index_list_answer, vector_size)
+    answer = send_validated_query(question, partial_validate_index_list_answer, script, commands_list)
+    return parse_index_list(answer, vector_size)
+
+
+def send_query_corners(question, script, commands_list):
+    """
+    :param question: a string, the question the program will print
+    :param script: a list with the user's raw answers, by order
+    :param commands_list: an object that can contains all the information we need to build the figure.
+    :return: a list of the corners in the user's answer: lon_min, lat_min, lon_max, lat_max
+
+    about: asking the user for the corners of a map, and validating them
+    """
+    answer = send_validated_query(question, validate_corners_answer, script, commands_list)
+    return parse_corners(answer)
+
+
+def send_validated_query(question, validate, script, commands_list):
+    """
+    :param question: a string, the question the program will print
+    :param validate: a function that gets an answer, and returns True if it is legal or one of the special answers
+    ('ll', 'banana?' and 'turtle'), False if not
+    :param script: a list with the user's raw answers, by order
+    :param commands_list: an object that can contains all the information we need to build the figure.
+    :return: the users raw answer
+
+    about: asking the question until a legal answer is given, and adding the answer to the script. The special answers
+    are answered, and the question is asked again: 'll' prints the list of labels, 'banana?' and 'turtle' print a
+    surprise.
+    """
+    import safer_prompt_toolkit
 
     while True:
-        # asking the question and validating the answer with partial_validate_answer, that
-        # uses validate_answer function.
+        # asking the question and validating the answer with validate
         answer = safer_prompt_toolkit.prompt(
             message=question + "\n",
-            validator=safer_prompt_toolkit.validation.Validator.from_callable(partial_validate_answer,
+            validator=safer_prompt_toolkit.validation.Validator.from_callable(validate,
                                                                               error_message="\nInput is not a valid "
                                                                                             "answer to the question."),
             force_fail_safe=is_reading_from_file)
-        if answer not in ['ll', 'banana?', 'turtle'] and answer in possible_answer_string:
+        if answer not in ['ll', 'banana?', 'turtle'] and validate(answer):
             break
         # printing the list of label again and asking the same question
         if answer == 'll':
@@ -577,6 +743,50 @@ def send_query(question, possible_answers, script, commands_list):
     return answer
 
 
+def parse_corners(answer):
+    """
+    :param answer: the users answer, lon_min,lat_min,lon_max,lat_max
+    :return: a list of the corners in answer, as floats
+
+    about: converting an answer about the corners of a map to a list of floats. raises a ValueError if answer is not
+    legal.
+
+    call_example:
+    parse_corners("-20,30,40,60")
+    -> [-20.0, 30.0, 40.0, 60.0]
+    """
+    corners = [float(part) for part in answer.split(',')]
+    if len(corners) != 4:
+        raise ValueError("there must be 4 corners")
+    if not all(-90 <= lat <= 90 for lat in corners[1::2]) or corners[1] >= corners[3]:
+        raise ValueError("the latitudes must be between -90 and 90, from south to north")
+    return corners
+
+
+def parse_index_list(answer, vector_size):
+    """
+    :param answer: the users answer, one index, indexes separated by commas, or a range as start:stop[:step]
+    :param vector_size: the size of the vector the indexes are taken from
+    :return: a list of the indexes in answer
+
+    about: converting an answer about indexes to a list of indexes. raises a ValueError if answer is not legal.
+
+    call_example:
+    parse_index_list("0:10:4", 124)
+    -> [0, 4, 8]
+    """
+    if ':' in answer:
+        range_parts = [int(part) if part.strip() else None for part in answer.split(':')]
+        if len(range_parts) > 3:
+            raise ValueError("too many parts in range")
+        indexes = list(range(vector_size)[slice(*range_parts)])
+    else:
+        indexes = [int(part) for part in answer.split(',')]
+    if len(indexes) == 0 or not all(0 <= index < vector_size for index in indexes):
+        raise ValueError("index out of range")
+    return indexes
+
+
 def send_query_script_file(question, possible_answers, script):
     """
     :param question: a string, the question the program will print
@@ -586,6 +796,7 @@ def send_query_script_file(question, possible_answers, script):
 
     about: asking the user for input and validating it
     """
+    import safer_prompt_toolkit
     # creating the possible_answer_string and converting every element in it to a string
     possible_answer_string = [str(a) for a in possible_answers]
 
@@ -614,6 +825,7 @@ def send_query_path(question, script):
 
     about: asking the user for an address and suggesting completions while typing
     """
+    import safer_prompt_toolkit
     answer = safer_prompt_toolkit.prompt(message=question + "\n",
                                          completer=safer_prompt_toolkit.completion.PathCompleter(),
                                          force_fail_safe=is_reading_from_file)
@@ -628,6 +840,7 @@ def send_query_path_new_script(question):
 
     about: asking the user for an address and suggesting completions while typing
     """
+    import safer_prompt_toolkit
     answer = safer_prompt_toolkit.prompt(message=question + "\n",
                                          completer=safer_prompt_toolkit.completion.PathCompleter(),
                                          force_fail_safe=is_reading_from_file)
@@ -655,3 +868,32 @@ def validate_answer(possible_answer_string, answer):
     :return: True if answer is in possible_answer_string, False if not
     """
     return answer in possible_answer_string
+
+
+def validate_corners_answer(answer):
+    """
+    :param answer: the users answer
+    :return: True if answer is legal corners of a map, or a special answer, False if not
+    """
+    if answer in ['ll', 'banana?', 'turtle']:
+        return True
+    try:
+        parse_corners(answer)
+    except ValueError:
+        return False
+    return True
+
+
+def validate_index_list_answer(vector_size, answer):
+    """
+    :param vector_size: the size of the vector the indexes are taken from
+    :param answer: the users answer
+    :return: True if answer is a legal index list, or a special answer, False if not
+    """
+    if answer in ['ll', 'banana?', 'turtle']:
+        return True
+    try:
+        parse_index_list(answer, vector_size)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,231 @@
+"""
+Welcome to Instrumentation.
+This module records how long every stage of making a figure takes - reading and decoding the netCDF file, arranging
+the fields, building the map base, contouring, rendering and saving - with the bytes read from the netCDF file and the
+peak memory of every stage, so a slow run shows where its time went.
+
+algorithm: the stages are marked in the code with the stage() context manager, or the timed_stage decorator of a
+whole function. While is_recording is False they cost a function call and nothing is recorded. When it is True, every
+stage records its start, wall time, the bytes netCDF_file_handler.read_values() read during it, the peak of the
+memory python allocated during it (with tracemalloc, when is_tracing_memory is True), and the peak RSS of the process
+at its end. Stages can be nested, and every thread has its own stages, so the reads of omnom.FramePrefetcher's thread
+are recorded as its own stages.
+The records can be saved as a JSON summary, the calls, seconds, bytes and peak memory of every stage, with
+write_summary(), or as a trace file with write_chrome_trace(), that opens in chrome://tracing or https://ui.perfetto.dev
+with a bar for every stage on a timeline of every thread.
+
+call_example:
+Instrumentation.start_recording()
+... making a map ...
+Instrumentation.write_summary("stages.json")
+Instrumentation.write_chrome_trace("stages.trace.json")
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# if the stages are recorded
+is_recording = False
+
+# if the peak memory python allocated in every stage is recorded with tracemalloc. tracemalloc makes python's
+# allocations (and imports) a few times slower, so it is off unless asked for, and the peak RSS of the process is
+# recorded either way
+is_tracing_memory = False
+
+# the records of the stages that ended, by the order they ended
+stage_records = []
+
+# the time recording started, the time 0 of the trace
+recording_start_time = 0.0
+
+# the stages that are running in every thread, from the outermost
+thread_stages = threading.local()
+
+
+def start_recording(is_tracing_memory_allocations=None):
+    """
+    :param is_tracing_memory_allocations: if the peak memory of the stages is recorded with tracemalloc. defaults to
+    is_tracing_memory
+
+    about: starting to record the stages, and forgetting the stages recorded before
+    """
+    global is_recording, is_tracing_memory, recording_start_time
+    if is_tracing_memory_allocations is not None:
+        is_tracing_memory = is_tracing_memory_allocations
+    if is_tracing_memory:
+        import tracemalloc
+        tracemalloc.start()
+    stage_records.clear()
+    recording_start_time = time.perf_counter()
+    is_recording = True
+
+
+def stop_recording():
+    """
+    about: stopping to record the stages. the records are kept until recording starts again
+    """
+    global is_recording
+    is_recording = False
+    if is_tracing_memory:
+        import tracemalloc
+        tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def stage(name, **details):
+    """
+    :param name: the name of the stage, like 'omnom.make_map_base' or 'contourf'
+    :param details: details of the stage that are saved in its record, like the name of the variable that is read
+
+    about: recording the code in the with block as a stage
+
+    call_example:
+    with Instrumentation.stage("contourf"):
+        ax.contourf(xx, yy, scalar_field)
+    """
+    if not is_recording:
+        yield
+        return
+
+    stages = get_thread_stages()
+    stage_record = {"name": name, "thread": threading.current_thread().name, "depth": len(stages),
+                    "start": time.perf_counter() - recording_start_time, "bytes_read": 0, "details": details}
+    # the peak of the outer stage until now is kept in it, as the peak is restarted for this stage
+    if is_tracing_memory:
+        import tracemalloc
+        if stages:
+            stages[-1]["memory_peak"] = max(stages[-1].get("memory_peak", 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    stages.append(stage_record)
+    try:
+        yield
+    finally:
+        stages.pop()
+        stage_record["seconds"] = time.perf_counter() - recording_start_time - stage_record["start"]
+        if is_tracing_memory:
+            import tracemalloc
+            stage_record["memory_peak"] = max(stage_record.get("memory_peak", 0), tracemalloc.get_traced_memory()[1])
+            if stages:
+                stages[-1]["memory_peak"] = max(stages[-1].get("memory_peak", 0), stage_record["memory_peak"])
+        stage_record["peak_rss"] = get_peak_rss()
+        stage_records.append(stage_record)
+
+
+def timed_stage(function):
+    """
+    :param function: a function to record every call of as a stage
+    :return: the function, recorded as a stage named by its module and name (with its class, for a method)
+
+    call_example:
+    @Instrumentation.timed_stage
+    def make_map_base(netcdf_file, commands_list, ax=None):
+    records every call as the stage 'omnom.make_map_base'
+    """
+    stage_name = function.__module__ + "." + function.__qualname__
+
+    @functools.wraps(function)
+    def recorded_function(*args, **kwargs):
+        if not is_recording:
+            return function(*args, **kwargs)
+        with stage(stage_name):
+            return function(*args, **kwargs)
+    return recorded_function
+
+
+def add_bytes_read(bytes_read):
+    """
+    :param bytes_read: the number of bytes read from a netCDF file
+
+    about: adding the bytes to every stage that is running in the thread
+    """
+    if not is_recording:
+        return
+    for stage_record in get_thread_stages():
+        stage_record["bytes_read"] += bytes_read
+
+
+def get_thread_stages():
+    """
+    :return: the list of the stages that are running in the current thread, from the outermost
+    """
+    if not hasattr(thread_stages, "stages"):
+        thread_stages.stages = []
+    return thread_stages.stages
+
+
+def get_peak_rss():
+    """
+    :return: the peak resident memory of the process in bytes, or None where it can't be found (windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux gives the peak in kilobytes, and macOS in bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def summarize_stages():
+    """
+    :return: a dictionary of the number of calls, total and maximum seconds, bytes read, and the peaks of memory of
+    every stage, by name, from the slowest stage
+
+    call_example:
+    summarize_stages()
+    -> {'omnom.make_map_base': {'calls': 1, 'seconds': 1.52, 'max_seconds': 1.52, 'bytes_read': 14400,
+        'memory_peak': 41943040, 'peak_rss': 210763776}, ...}
+    """
+    summary = {}
+    for stage_record in stage_records:
+        stage_summary = summary.setdefault(stage_record["name"], {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                                  "bytes_read": 0, "memory_peak": None,
+                                                                  "peak_rss": None})
+        stage_summary["calls"] += 1
+        stage_summary["seconds"] += stage_record["seconds"]
+        stage_summary["max_seconds"] = max(stage_summary["max_seconds"], stage_record["seconds"])
+        stage_summary["bytes_read"] += stage_record["bytes_read"]
+        for key in ["memory_peak", "peak_rss"]:
+            if stage_record.get(key) is not None:
+                stage_summary[key] = max(stage_summary[key] or 0, stage_record[key])
+    return dict(sorted(summary.items(), key=lambda item: -item[1]["seconds"]))
+
+
+def write_summary(path_to_file):
+    """
+    :param path_to_file: the path of the JSON file to write
+
+    about: saving the summary of the stages from summarize_stages(), and the total wall time of the recording
+    """
+    with open(path_to_file, "w") as f:
+        json.dump({"seconds": time.perf_counter() - recording_start_time, "stages": summarize_stages()}, f, indent=1)
+
+
+def write_chrome_trace(path_to_file):
+    """
+    :param path_to_file: the path of the trace file to write
+
+    about: saving the stages in the trace event format of chrome://tracing and https://ui.perfetto.dev. Every stage is
+    a complete event ("ph": "X") with its start and duration in microseconds, on the timeline of its thread, and its
+    bytes read and peaks of memory are its arguments
+    """
+    thread_ids = {}
+    trace_events = []
+    for stage_record in stage_records:
+        thread_id = thread_ids.setdefault(stage_record["thread"], len(thread_ids) + 1)
+        arguments = dict(stage_record["details"], bytes_read=stage_record["bytes_read"],
+                         memory_peak=stage_record.get("memory_peak"), peak_rss=stage_record.get("peak_rss"))
+        trace_events.append({"name": stage_record["name"], "cat": stage_record["name"].split(".")[0], "ph": "X",
+                             "ts": stage_record["start"] * 1e6, "dur": stage_record["seconds"] * 1e6,
+                             "pid": os.getpid(), "tid": thread_id, "args": arguments})
+    # naming the threads of the timeline
+    for thread_name, thread_id in thread_ids.items():
+        trace_events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread_id,
+                             "args": {"name": thread_name}})
+    with open(path_to_file, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,227 @@
+"""
+Welcome to Job Manager.
+This module runs jobs from a job file, without asking the user any question. A job file describes the figures to make by
+the names of the netCDF variables, and not by their indexes in the labels list, so it keeps working when the order of
+the variables changes.
+
+algorithm: load_job_file() reads a JSON or YAML job file into a list of jobs. Every job is a dictionary, and the
+"defaults" dictionary of the file is added to every one of them. run_job() opens the job's netCDF file, and
+make_commands_list() converts the job into a MapCommandsList or GraphCommandsList object, the same object the questions
+of InputManager fill. Then the figure is made and saved exactly like in an interactive run.
+
+job file example:
+{
+    "defaults": {"netcdf_path": "data.nc", "lat": "latitude", "lon": "longitude", "time": "time",
+                 "fig_format": "png", "fig_location": "out"},
+    "jobs": [
+        {"scalar_field": "msl", "time_index": "0:124:4", "name_of_fig": "msl"},
+        {"lon_component": "u10", "lat_component": "v10", "time_index": 5, "quiver_space": 5, "name_of_fig": "wind"}
+    ]
+}
+"""
+
+import json
+import os
+import netCDF_file_handler as nfh
+from InputManager import MapCommandsList, GraphCommandsList, CommandsList
+import InputManager
+import OutputManager
+
+# the keys of a job that are names of netCDF variables, and the commands list fields their indexes in info_list are
+# saved in
+variable_keys = {"lat": "lat", "lon": "lon", "time": "time", "depth": "depth", "scalar_field": "scalar_field_label",
+                 "lon_component": "lon_component", "lat_component": "lat_component", "rad_component": "rad_component",
+                 "ang_component": "ang_component", "x_axis": "x_axis", "y_axis": "y_axis"}
+
+# the keys of a job that are saved in the commands list as they are
+preference_keys = ["quiver_color", "quiver_space", "width", "height", "resolution", "projection", "is_full_resolution",
+                   "lon_lower_left_corner", "lat_lower_left_corner", "lon_upper_right_corner", "lat_upper_right_corner",
+                   "fig_format", "fig_location", "name_of_fig"]
+
+# if the maps of jobs without an "is_full_resolution" key draw every grid point. set by the '--full-resolution' flag
+is_full_resolution = False
+
+# the rest of the keys a job can have
+other_keys = ["netcdf_path", "plot_type", "time_index", "depth_index", "lat_index", "lon_index", "reduction",
+              "processes", "bundle_path"]
+
+
+def load_job_file(path_to_file):
+    """
+    :param path_to_file: the path of the job file, a JSON file or a YAML file (.yaml or .yml)
+    :return: a list of jobs, every job is a dictionary
+
+    about: reading the jobs from a job file. The file can be one job, a list of jobs, or a dictionary with a "jobs"
+    list and an optional "defaults" dictionary that is added to every job.
+    """
+    with open(path_to_file) as f:
+        if os.path.splitext(path_to_file)[1].lower() in [".yaml", ".yml"]:
+            try:
+                import yaml
+            except ImportError:
+                raise Exception("reading a YAML job file needs the PyYAML package, use a JSON job file instead")
+            job_file = yaml.safe_load(f)
+        else:
+            job_file = json.load(f)
+    return get_jobs(job_file)
+
+
+def get_jobs(job_file):
+    """
+    :param job_file: the content of a job file: one job, a list of jobs, or a dictionary with a "jobs" list and an
+    optional "defaults" dictionary
+    :return: a list of jobs, every job is a dictionary
+    """
+    # splitting to the three possible structures of a job file
+    if isinstance(job_file, list):
+        jobs, defaults = job_file, {}
+    elif "jobs" in job_file:
+        jobs, defaults = job_file["jobs"], job_file.get("defaults", {})
+    else:
+        jobs, defaults = [job_file], {}
+    return [dict(defaults, **job) for job in jobs]
+
+
+def run_job_file(path_to_file):
+    """
+    :param path_to_file: the path of the job file
+
+    about: running all the jobs in a job file, one after the other in the same process
+    """
+    jobs = load_job_file(path_to_file)
+    for job_number, job in enumerate(jobs):
+        print("job", job_number + 1, "of", len(jobs))
+        run_job(job)
+
+
+def run_job(job, netcdf_file=None):
+    """
+    :param job: a dictionary that describes the figure to make
+    :param netcdf_file: the job's netCDF file, if it is already open. by default it is opened and closed by the job
+    :return: a list of the names of the figures' files
+
+    about: making and saving the figure of one job. Jobs are not interactive, so the figure is always a headless figure.
+    A job with a "bundle_path" draws the maps of bundles again, with the job's preferences, without a netCDF file.
+    """
+    if "bundle_path" in job:
+        import omnom
+        return omnom.make_maps_from_bundles(job["bundle_path"], {key: job[key] for key in preference_keys if key in job})
+
+    is_opening_netcdf_file = netcdf_file is None
+    if is_opening_netcdf_file:
+        netcdf_file = nfh.open_netcdf(job["netcdf_path"])
+    # opening the figure we want to create
+    plt_figure = OutputManager.make_headless_figure()
+
+    # the netCDF file and the figure are freed also when the job fails, as the render server keeps running after it
+    try:
+        commands_list = make_commands_list(job, netcdf_file)
+
+        # splitting the cases for different types of plots. omnom imports Basemap and ognom imports nothing maps need,
+        # so each of them is imported only by the jobs of its type
+        if commands_list.plot_type == 0:
+            import omnom
+        else:
+            import ognom
+        if commands_list.plot_type == 0 and job.get("processes", 1) > 1 and \
+                commands_list.fig_format not in OutputManager.animation_formats + [OutputManager.bundle_format]:
+            fig_file_names = omnom.make_map_frames_parallel(commands_list, max_workers=job["processes"])
+        elif commands_list.plot_type == 0:
+            fig_file_names = omnom.make_map_frames(netcdf_file, commands_list, plt_figure)
+        else:
+            ognom.make_graph_2d(netcdf_file, commands_list, plt_figure.gca())
+            OutputManager.print_fig(plt_figure, commands_list)
+            fig_file_names = [OutputManager.get_fig_file_name(commands_list)]
+    finally:
+        if is_opening_netcdf_file:
+            netcdf_file.close()
+        OutputManager.release_fig(plt_figure)
+    return fig_file_names
+
+
+def make_commands_list(job, netcdf_file):
+    """
+    :param job: a dictionary that describes the figure to make
+    :param netcdf_file: the job's netCDF file
+    :return: a MapCommandsList or GraphCommandsList object with the job's values
+
+    about: converting a job to the commands list object that the questions of InputManager would have filled. Variable
+    names are converted to their indexes in info_list, and the time and depth indexes can be given like the answers to
+    the time and depth questions: an index, a list of indexes or a range as a string, "start:stop:step".
+    """
+    unknown_keys = [key for key in job if key not in list(variable_keys) + preference_keys + other_keys]
+    if unknown_keys:
+        raise Exception("unknown keys in job: " + ", ".join(unknown_keys))
+
+    commands_list = CommandsList()
+    commands_list.netcdf_path = job["netcdf_path"]
+    commands_list.make_script_file = False
+    InputManager.update_info_list_in_command_list(netcdf_file, commands_list)
+
+    # converting the commands_list object to the type of the plot, maps by default
+    commands_list.plot_type = {"map": 0, "graph": 1}[job.get("plot_type", "map")]
+    if commands_list.plot_type == 0:
+        commands_list = MapCommandsList(commands_list)
+        commands_list.is_full_resolution = is_full_resolution
+    else:
+        commands_list = GraphCommandsList(commands_list)
+
+    # converting the variable names to their indexes in info_list
+    for key, field in variable_keys.items():
+        if job.get(key) is not None:
+            if not hasattr(commands_list, field):
+                raise Exception(key + " is not used in " + job.get("plot_type", "map") + " jobs")
+            if job[key] not in commands_list.info_list:
+                raise Exception(key + " variable '" + str(job[key]) + "' not found in " + job["netcdf_path"])
+            setattr(commands_list, field, commands_list.info_list.index(job[key]))
+    for key in preference_keys:
+        if key in job:
+            if not hasattr(commands_list, key):
+                raise Exception(key + " is not used in " + job.get("plot_type", "map") + " jobs")
+            setattr(commands_list, key, job[key])
+
+    # the same fields the map questions fill from the answers about the kind of field
+    if commands_list.plot_type == 0:
+        commands_list.is_vector_field = commands_list.scalar_field_label is None
+        commands_list.is_polar = commands_list.rad_component is not None
+    commands_list.is_depends_on_time = commands_list.time is not None
+    commands_list.is_depends_on_depth = commands_list.depth is not None
+
+    # getting the time and depth values of the figures
+    if commands_list.is_depends_on_time:
+        time_values = get_job_index_list(job.get("time_index", 0), nfh.get_time_vector_size(netcdf_file,
+                                                                                             commands_list))
+        commands_list.current_time_value = time_values[0]
+        if len(time_values) > 1:
+            commands_list.time_values = time_values
+    if commands_list.is_depends_on_depth:
+        depth_values = get_job_index_list(job.get("depth_index", 0), nfh.get_depth_vector_size(netcdf_file,
+                                                                                                commands_list))
+        commands_list.current_depth_value = depth_values[0]
+        if len(depth_values) > 1:
+            commands_list.depth_values = depth_values
+
+    # getting the latitude and longitude indexes of the points the graph's lines are taken at, and the kind of graph
+    if commands_list.plot_type == 1:
+        commands_list.reduction = {"lines": 0, "area_mean": 1, "climatology": 2}[job.get("reduction", "lines")]
+        for key, field, label in [("lat_index", "lat_values", commands_list.lat),
+                                  ("lon_index", "lon_values", commands_list.lon)]:
+            if label is not None:
+                vector_size = nfh.get_metadata_index(netcdf_file)["variables"][commands_list.info_list[label]]["size"]
+                setattr(commands_list, field, get_job_index_list(job.get(key, 0), vector_size))
+    return commands_list
+
+
+def get_job_index_list(index_value, vector_size):
+    """
+    :param index_value: an index, a list of indexes, or a string in the format of the time and depth questions answers
+    :param vector_size: the size of the vector the indexes are taken from
+    :return: a list of indexes
+
+    call_example:
+    get_job_index_list("0:10:4", 124)
+    -> [0, 4, 8]
+    """
+    if isinstance(index_value, list):
+        index_value = ",".join(str(index) for index in index_value)
+    return InputManager.parse_index_list(str(index_value), vector_size)
@@ -3,8 +3,37 @@ Welcome to Output Manager.
 This module prints and creates the output files and commands script.
 """
 
-import matplotlib.pyplot as plt
 import pickle
+import os
+import json
+import shutil
+import struct
+import subprocess
+import zlib
+import numpy as np
+import Instrumentation
+
+# the figure formats that are images of pixels. frames in these formats are saved by compositing
+raster_formats = ['png', 'jpg', 'jpeg', 'tif', 'tiff']
+
+# the figure formats of animations. all the frames of a run are saved to one file, and every frame is encoded as soon as
+# it is drawn
+animation_formats = ['gif', 'apng', 'mp4']
+
+# the number of frames per second of the animations
+animation_frames_per_second = 4
+
+# the path of ffmpeg, or None if it is not found. animations are encoded with ffmpeg when it is found, and gif and apng
+# animations are encoded by AnimationWriter itself when it is not. mp4 animations need ffmpeg
+ffmpeg_path = shutil.which("ffmpeg")
+
+# the format of map bundles: the data a map draws, its coordinates and its commands list in a compressed npz file, that
+# the map can be drawn again from, in another projection or quiver_space, without the netCDF file
+bundle_format = 'npz'
+
+# if frames of a few figures in a raster format are saved by rendering their base once and compositing it over the data
+# of every frame. When it is False, every frame is rendered whole by print_fig()
+is_compositing_frames = True
 
 
 def print_script_to_file(script, commands_list):
@@ -28,20 +57,469 @@ def print_script_to_file(script, commands_list):
         script_file.close()
 
 
+@Instrumentation.timed_stage
 def print_fig(plt_figure, commands_list):
     """
     :param plt_figure: the final figure
     :param commands_list: an object that contains all the information we need to build the figure.
 
-    about: creating the figure output, in a few formats
+    about: creating the figure output, in a few formats. The figure is written to a temporary file that is then renamed
+    to the full name, so a few processes can save figures to the same directory, and a figure file is never seen half
+    written.
     """
 
-    # creating the full name of the file
-    file_name = commands_list.fig_location + "\\" + commands_list.name_of_fig + "." + commands_list.fig_format
+    # creating the full name of the file, and a temporary name that no other process uses
+    file_name = get_fig_file_name(commands_list)
+    temporary_file_name = file_name + "." + str(os.getpid()) + ".tmp"
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+
+    # an animation of one frame is written by an AnimationWriter, that writes its own temporary file
+    if commands_list.fig_format in animation_formats:
+        animation_writer = make_animation_writer(plt_figure, commands_list)
+        animation_writer.write_frame(render_fig(plt_figure))
+        animation_writer.close()
+        return
+    if commands_list.fig_format == bundle_format:
+        raise Exception("only maps can be saved as bundles, by omnom.make_map_frames()")
 
     # splitting to two cases: pickle format and the rest of the formats.
     if commands_list.fig_format == 'pickle':
-        with open(file_name, 'wb') as f:
+        with open(temporary_file_name, 'wb') as f:
             pickle.dump(plt_figure, f)
     else:
-        plt.savefig(file_name)
+        plt_figure.savefig(temporary_file_name, format=commands_list.fig_format)
+    os.replace(temporary_file_name, file_name)
+
+
+@Instrumentation.timed_stage
+def print_bundle(commands_list, settings, arrays):
+    """
+    :param commands_list: an object that contains all the information we need to build the figure.
+    :param settings: a dictionary of the commands list's values that can be saved as JSON
+    :param arrays: a dictionary of the arrays to save, by name
+
+    about: saving a bundle of a map, in the bundle_format. The arrays are compressed with np.savez_compressed, and the
+    settings are saved as a JSON string in the 'settings' array. Like print_fig(), the bundle is written to a temporary
+    file that is then renamed to the full name.
+    """
+    file_name = get_fig_file_name(commands_list)
+    temporary_file_name = file_name + "." + str(os.getpid()) + ".tmp"
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    # numpy's scalars, like the means of coordinates, are saved as python's numbers
+    settings_json = json.dumps(settings, default=lambda value: value.item())
+    with open(temporary_file_name, 'wb') as f:
+        np.savez_compressed(f, settings=np.array(settings_json), **arrays)
+    os.replace(temporary_file_name, file_name)
+
+
+def load_bundle(path_to_file):
+    """
+    :param path_to_file: the path of a bundle saved by print_bundle()
+    :return: the settings dictionary and the dictionary of the arrays of the bundle
+
+    call_example:
+    load_bundle('out/msl_t5_d0.npz')
+    -> ({'name_of_fig': 'msl', 'projection': 'gall', ...}, {'lat': array([...]), 'lon': array([...]),
+        'scalar_field': array([[...]])})
+    """
+    with np.load(path_to_file, allow_pickle=False) as bundle:
+        arrays = {name: bundle[name] for name in bundle.files}
+    return json.loads(str(arrays.pop('settings'))), arrays
+
+
+@Instrumentation.timed_stage
+def make_base_layer_compositor(plt_figure, commands_list):
+    """
+    :param plt_figure: a figure with only its base drawn on it, like the coastlines and axes of a map
+    :param commands_list: an object that contains all the information we need to build the figure.
+    :return: a BaseLayerCompositor of the figure, or None if its frames should be saved with print_fig()
+
+    about: frames are composited only in raster and animation formats, and only on figures drawn with an Agg canvas, the
+    canvas of headless figures and of the default interactive backends
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    if not is_compositing_frames or commands_list.fig_format not in raster_formats + animation_formats or \
+            not isinstance(plt_figure.canvas, FigureCanvasAgg):
+        return None
+    return BaseLayerCompositor(plt_figure)
+
+
+# a class that renders the static base of a figure once, and saves the frames drawn on it by rendering only the data of
+# every frame and compositing the rendered base over it. The base is all the artists on the figure when the compositor
+# is made, so the data of the frames must be drawn after it. The base is composited over the data, like coastlines over
+# the filled contours of a map. Only the pixels the base covers are composited, so a frame costs little more than
+# rendering its data.
+class BaseLayerCompositor:
+    plt_figure: object  # the figure, with an Agg canvas
+    base_artists: list  # the artists of the base, hidden while the data of a frame is rendered
+    base_pixels: tuple  # the indexes of the pixels the rendered base covers
+    base_colors: np.ndarray  # the colors of the base's pixels, multiplied by their alpha
+    base_transparencies: np.ndarray  # 255 - the alpha of the base's pixels
+
+    def __init__(self, plt_figure):
+        self.plt_figure = plt_figure
+        backgrounds = [plt_figure.patch] + [ax.patch for ax in plt_figure.axes]
+        self.base_artists = [artist for artist in plt_figure.get_children() if artist not in backgrounds]
+        for ax in plt_figure.axes:
+            self.base_artists.remove(ax)
+            self.base_artists += [artist for artist in ax.get_children() if artist is not ax.patch]
+
+        # rendering the base over a transparent background, and keeping only the pixels it covers
+        base_layer = self.render_with_hidden_artists(backgrounds)
+        self.base_pixels = np.nonzero(base_layer[..., 3])
+        base_alphas = base_layer[self.base_pixels][:, 3:].astype(np.uint32)
+        self.base_colors = base_layer[self.base_pixels][:, :3] * base_alphas
+        self.base_transparencies = 255 - base_alphas
+
+    def render_with_hidden_artists(self, hidden_artists):
+        """
+        :param hidden_artists: the artists not to render
+        :return: an RGBA array of the rendered figure, in its pixels size
+        """
+        visibilities = [artist.get_visible() for artist in hidden_artists]
+        for artist in hidden_artists:
+            artist.set_visible(False)
+        try:
+            self.plt_figure.canvas.draw()
+            return np.array(self.plt_figure.canvas.buffer_rgba())
+        finally:
+            for artist, visibility in zip(hidden_artists, visibilities):
+                artist.set_visible(visibility)
+
+    @Instrumentation.timed_stage
+    def render_frame(self):
+        """
+        :return: an RGBA array of the frame
+
+        about: rendering only the data of the frame over the figure's background, and compositing the base over it
+        """
+        frame = self.render_with_hidden_artists(self.base_artists)
+        frame[self.base_pixels + (slice(None, 3),)] = \
+            (self.base_colors + frame[self.base_pixels][:, :3] * self.base_transparencies + 127) // 255
+        return frame
+
+    @Instrumentation.timed_stage
+    def print_frame(self, commands_list):
+        """
+        :param commands_list: an object that contains all the information we need to build the figure.
+
+        about: rendering the frame with render_frame(), and writing the image like print_fig()
+        """
+        import matplotlib.image
+
+        frame = self.render_frame()
+
+        # writing to a temporary file, then renaming it, like print_fig()
+        file_name = get_fig_file_name(commands_list)
+        temporary_file_name = file_name + "." + str(os.getpid()) + ".tmp"
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        matplotlib.image.imsave(temporary_file_name, frame, format=commands_list.fig_format, dpi=self.plt_figure.dpi)
+        os.replace(temporary_file_name, file_name)
+
+
+def get_fig_file_name(commands_list):
+    """
+    :param commands_list: an object that contains all the information we need to build the figure.
+    :return: the full name of the figure's file
+
+    about: creating the full name of the figure's file. If more than one map is made in the run, the current time and
+    depth values are added to the name, so every map gets its own file. A graph draws all its times and depths as
+    lines of one figure, and an animation has all the maps as its frames, so their names stay as they are.
+
+    call_example:
+    get_fig_file_name(commands_list) with name_of_fig = 'output' and time_values = [0, 4], while making the second fig
+    -> 'location/output_t4_d0.png'
+    """
+    name_of_fig = commands_list.name_of_fig
+    if commands_list.plot_type == 0 and (commands_list.time_values or commands_list.depth_values) and \
+            commands_list.fig_format not in animation_formats:
+        name_of_fig += "_t" + str(commands_list.current_time_value) + "_d" + str(commands_list.current_depth_value)
+    return os.path.join(commands_list.fig_location, name_of_fig + "." + commands_list.fig_format)
+
+
+def make_headless_figure():
+    """
+    :return: a new figure that is not managed by pyplot
+
+    about: creating a figure that is drawn with the non interactive Agg canvas, without pyplot and its backend. It can
+    be saved with print_fig(), and it is freed with release_fig() or when there are no more references to it.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    plt_figure = Figure()
+    FigureCanvasAgg(plt_figure)
+    return plt_figure
+
+
+def release_fig(plt_figure):
+    """
+    :param plt_figure: a figure that is not needed anymore
+
+    about: freeing the artists and data drawn on the figure. Headless figures are not kept by pyplot, so after this,
+    nothing holds their memory.
+    """
+    plt_figure.clear()
+
+
+@Instrumentation.timed_stage
+def render_fig(plt_figure):
+    """
+    :param plt_figure: a figure with an Agg canvas
+    :return: an RGBA array of the rendered figure, in its pixels size
+    """
+    plt_figure.canvas.draw()
+    return np.array(plt_figure.canvas.buffer_rgba())
+
+
+def make_animation_writer(plt_figure, commands_list):
+    """
+    :param plt_figure: the figure the frames of the animation are drawn on
+    :param commands_list: an object that contains all the information we need to build the figure.
+    :return: an AnimationWriter of the animation's file
+
+    about: the frames of an animation are taken from the pixels of the figure's Agg canvas, the canvas of headless
+    figures and of the default interactive backends
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    if not isinstance(plt_figure.canvas, FigureCanvasAgg):
+        raise Exception("animations are made only on figures with an Agg canvas, run with the --headless flag")
+    return AnimationWriter(get_fig_file_name(commands_list), commands_list.fig_format)
+
+
+# a class that writes an animation to a file frame by frame. every frame is encoded when it is written, and only the
+# encoded frame is kept, so the memory does not grow with the number of frames, and no file is written for a frame.
+# With ffmpeg the frames are piped to it as raw pixels. Without it, gif frames are quantized to a color table of up to
+# 256 colors and LZW encoded, and apng frames are deflated, by the functions below.
+class AnimationWriter:
+    file_name: str  # the full name of the animation's file
+    temporary_file_name: str  # the file the animation is written to, until it is closed
+    fig_format: str  # one of animation_formats
+    frames_per_second: float  # the number of frames per second of the animation
+    frames_count: int  # the number of frames written so far
+    frame_size: tuple  # the height and width of the frames in pixels
+    ffmpeg_process: object  # the ffmpeg process the frames are piped to, or None
+    output_file: object  # the animation's file when it is encoded without ffmpeg, or None
+    actl_position: int  # the position of the apng acTL chunk in the file, that has the number of frames
+
+    def __init__(self, file_name, fig_format, frames_per_second=None):
+        if fig_format == 'mp4' and ffmpeg_path is None:
+            raise Exception("mp4 animations need ffmpeg, and it was not found. use gif or apng instead")
+        self.file_name = file_name
+        self.temporary_file_name = file_name + "." + str(os.getpid()) + ".tmp"
+        self.fig_format = fig_format
+        self.frames_per_second = frames_per_second or animation_frames_per_second
+        self.frames_count = 0
+        self.frame_size = None
+        self.ffmpeg_process = None
+        self.output_file = None
+        self.actl_position = 0
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+
+    @Instrumentation.timed_stage
+    def write_frame(self, frame):
+        """
+        :param frame: an RGBA array of the frame. all the frames must have the same size
+        """
+        if self.frame_size is None:
+            self.start(frame.shape[:2])
+        elif frame.shape[:2] != self.frame_size:
+            raise Exception("the frames of an animation must have the same size")
+
+        if self.ffmpeg_process is not None:
+            self.ffmpeg_process.stdin.write(np.ascontiguousarray(frame).tobytes())
+        elif self.fig_format == 'gif':
+            self.output_file.write(encode_gif_frame(frame[..., :3], round(100 / self.frames_per_second)))
+        else:
+            # the fcTL and fdAT chunks are numbered together. the first frame is an IDAT chunk, that has no number
+            sequence_number = max(0, self.frames_count * 2 - 1)
+            self.output_file.write(make_png_chunk(b"fcTL", struct.pack(
+                ">IIIIIHHBB", sequence_number, self.frame_size[1], self.frame_size[0], 0, 0, 1000,
+                round(1000 * self.frames_per_second), 0, 0)))
+            frame_data = zlib.compress(filter_png_rows(frame[..., :3]))
+            if self.frames_count == 0:
+                self.output_file.write(make_png_chunk(b"IDAT", frame_data))
+            else:
+                self.output_file.write(make_png_chunk(b"fdAT", struct.pack(">I", sequence_number + 1) + frame_data))
+        self.frames_count += 1
+
+    def start(self, frame_size):
+        """
+        :param frame_size: the height and width of the frames in pixels
+
+        about: starting ffmpeg, or writing the header of the animation's file
+        """
+        self.frame_size = frame_size
+        height, width = frame_size
+        if ffmpeg_path is not None:
+            output_arguments = {'mp4': ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-vf",
+                                        "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-f", "mp4"],
+                                'gif': ["-vf", "split[a][b];[a]palettegen=stats_mode=single[p];[b][p]paletteuse=new=1",
+                                        "-loop", "0", "-f", "gif"],
+                                'apng': ["-plays", "0", "-f", "apng"]}[self.fig_format]
+            self.ffmpeg_process = subprocess.Popen(
+                [ffmpeg_path, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba", "-s",
+                 str(width) + "x" + str(height), "-r", str(self.frames_per_second), "-i", "-"] + output_arguments +
+                [self.temporary_file_name], stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            return
+
+        self.output_file = open(self.temporary_file_name, "wb")
+        if self.fig_format == 'gif':
+            # the header, a screen with no global color table, and the extension that loops the animation forever
+            self.output_file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0x70, 0, 0))
+            self.output_file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", 0) + b"\x00")
+        else:
+            self.output_file.write(b"\x89PNG\r\n\x1a\n")
+            self.output_file.write(make_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+            # the number of frames is not known yet, it is written again when the file is closed
+            self.actl_position = self.output_file.tell()
+            self.output_file.write(make_png_chunk(b"acTL", struct.pack(">II", 1, 0)))
+
+    @Instrumentation.timed_stage
+    def close(self):
+        """
+        about: finishing the animation's file, and renaming it from its temporary name to its full name
+        """
+        if self.frames_count == 0:
+            raise Exception("an animation must have at least one frame")
+        if self.ffmpeg_process is not None:
+            _, ffmpeg_errors = self.ffmpeg_process.communicate()
+            if self.ffmpeg_process.returncode != 0:
+                raise Exception("ffmpeg failed to write " + self.file_name + ":\n" + ffmpeg_errors.decode())
+        elif self.fig_format == 'gif':
+            self.output_file.write(b"\x3b")
+            self.output_file.close()
+        else:
+            self.output_file.write(make_png_chunk(b"IEND", b""))
+            self.output_file.seek(self.actl_position)
+            self.output_file.write(make_png_chunk(b"acTL", struct.pack(">II", self.frames_count, 0)))
+            self.output_file.close()
+        os.replace(self.temporary_file_name, self.file_name)
+
+
+def encode_gif_frame(frame, delay):
+    """
+    :param frame: an RGB array of the frame
+    :param delay: the time the frame is shown, in hundredths of a second
+    :return: the bytes of the frame in a gif file: its graphic control extension, image descriptor, local color table
+    and LZW encoded pixels
+    """
+    height, width = frame.shape[:2]
+    color_table, color_indexes = quantize_frame(frame)
+    table_bits = max(1, int(np.ceil(np.log2(len(color_table)))))
+    color_table = np.vstack([color_table, np.zeros((2 ** table_bits - len(color_table), 3), np.uint8)])
+    min_code_size = max(2, table_bits)
+
+    # the LZW encoded pixels are split to sub-blocks of up to 255 bytes
+    encoded_pixels = lzw_encode(color_indexes, min_code_size)
+    sub_blocks = b"".join(bytes([len(encoded_pixels[start:start + 255])]) + encoded_pixels[start:start + 255]
+                          for start in range(0, len(encoded_pixels), 255))
+    return (b"\x21\xf9\x04\x04" + struct.pack("<H", delay) + b"\x00\x00" +
+            b"\x2c" + struct.pack("<HHHHB", 0, 0, width, height, 0x80 | (table_bits - 1)) +
+            color_table.astype(np.uint8).tobytes() + bytes([min_code_size]) + sub_blocks + b"\x00")
+
+
+def quantize_frame(frame):
+    """
+    :param frame: an RGB array of the frame
+    :return: a color table of up to 256 colors, and the index of the color of every pixel, by rows
+
+    about: a frame with up to 256 colors keeps its colors. Otherwise the color table has the 256 most common colors of
+    the frame, and every pixel gets the nearest of them. Maps have a few filled contours, so the common colors are the
+    contours, and only the antialiased edges change.
+    """
+    packed_colors = (frame[..., 0].astype(np.uint32) << 16 | frame[..., 1].astype(np.uint32) << 8 |
+                     frame[..., 2]).ravel()
+    colors, color_indexes, counts = np.unique(packed_colors, return_inverse=True, return_counts=True)
+    colors = np.stack([colors >> 16, (colors >> 8) & 255, colors & 255], axis=1).astype(np.int32)
+    if len(colors) <= 256:
+        return colors.astype(np.uint8), color_indexes.ravel()
+
+    color_table = colors[np.argsort(counts)[::-1][:256]]
+    nearest_colors = np.empty(len(colors), np.intp)
+    for start in range(0, len(colors), 4096):
+        distances = ((colors[start:start + 4096, np.newaxis] - color_table[np.newaxis]) ** 2).sum(axis=2)
+        nearest_colors[start:start + 4096] = distances.argmin(axis=1)
+    return color_table.astype(np.uint8), nearest_colors[color_indexes.ravel()]
+
+
+def lzw_encode(color_indexes, min_code_size):
+    """
+    :param color_indexes: the color table indexes of the pixels
+    :param min_code_size: the number of bits of the color table indexes, at least 2
+    :return: the LZW encoded pixels, in the variable length codes of gif files
+
+    about: the strings of indexes are saved in a dictionary by the code of their prefix and their last index. When the
+    dictionary is full (4096 codes) a clear code starts a new one
+    """
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    codes = {}
+    encoded = bytearray()
+    bits = clear_code
+    bits_count = code_size
+
+    color_indexes = color_indexes.tolist()
+    prefix = color_indexes[0]
+    for color_index in color_indexes[1:]:
+        key = prefix << 8 | color_index
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << bits_count
+        bits_count += code_size
+        if next_code == 4096:
+            bits |= clear_code << bits_count
+            bits_count += code_size
+            codes = {}
+            code_size = min_code_size + 1
+            next_code = end_code + 1
+        else:
+            if next_code >= 1 << code_size:
+                code_size += 1
+            codes[key] = next_code
+            next_code += 1
+        prefix = color_index
+        # writing the whole bytes
+        while bits_count >= 8:
+            encoded.append(bits & 255)
+            bits >>= 8
+            bits_count -= 8
+
+    bits |= prefix << bits_count
+    bits_count += code_size
+    bits |= end_code << bits_count
+    bits_count += code_size
+    while bits_count > 0:
+        encoded.append(bits & 255)
+        bits >>= 8
+        bits_count -= 8
+    return bytes(encoded)
+
+
+def filter_png_rows(frame):
+    """
+    :param frame: an RGB array of the frame
+    :return: the rows of the frame with the png Up filter, every row is the difference from the row above it, that
+    deflates better than the pixels themselves
+    """
+    rows = frame.reshape(frame.shape[0], -1)
+    filtered_rows = np.empty((rows.shape[0], rows.shape[1] + 1), np.uint8)
+    filtered_rows[:, 0] = 2
+    filtered_rows[0, 1:] = rows[0]
+    filtered_rows[1:, 1:] = rows[1:] - rows[:-1]
+    return filtered_rows.tobytes()
+
+
+def make_png_chunk(chunk_type, data):
+    """
+    :param chunk_type: the 4 bytes type of the chunk
+    :param data: the data of the chunk
+    :return: the chunk: its length, type, data and CRC
+    """
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
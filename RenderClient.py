@@ -0,0 +1,90 @@
+"""
+Welcome to Render Client.
+This module sends a job file to a running render server (see RenderServer), and prints the names of the figures' files
+the server made. It imports nothing but the standard library, so it starts fast. The job file is read with
+JobManager.load_job_file(), so JSON and YAML job files work like they do with '-j', and JobManager is imported only then.
+
+call_example:
+python RenderClient.py job.json
+python RenderClient.py jobs.yaml
+python RenderClient.py job.json --port 8765 -o map.png
+"""
+
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+# the port of the render server, when no other port is given
+default_port = 8765
+
+# the keys of a job that are paths, and are sent to the server as absolute paths, as its working directory is not the
+# client's working directory
+path_keys = ["netcdf_path", "fig_location", "bundle_path"]
+
+
+def submit(job_file, port=default_port, output_path=None):
+    """
+    :param job_file: the content of a job file: one job, a list of jobs, or a dictionary with "jobs" and "defaults"
+    :param port: the port of the render server
+    :param output_path: if given, the job must make one figure, and the figure is saved to this path
+    :return: the answer of the server, {"files": [...], "seconds": ...}, or {"files": [output_path]} with output_path
+    """
+    url = "http://127.0.0.1:" + str(port) + "/render" + ("?image=1" if output_path is not None else "")
+    request = urllib.request.Request(url, data=json.dumps(make_paths_absolute(job_file)).encode(),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+    except urllib.error.HTTPError as error:
+        raise Exception("render server error: " + json.loads(error.read()).get("error", str(error)))
+
+    if output_path is None:
+        return json.loads(body)
+    with open(output_path, "wb") as f:
+        f.write(body)
+    return {"files": [output_path]}
+
+
+def make_paths_absolute(job_file):
+    """
+    :param job_file: the content of a job file
+    :return: the content of the job file, with the paths in its jobs and defaults made absolute
+
+    call_example:
+    make_paths_absolute({"netcdf_path": "data.nc", "fig_location": "out"}) in C:\\NOM
+    -> {"netcdf_path": "C:\\NOM\\data.nc", "fig_location": "C:\\NOM\\out"}
+    """
+    if isinstance(job_file, list):
+        return [make_paths_absolute(job) for job in job_file]
+    if "jobs" in job_file:
+        return {"defaults": make_paths_absolute(job_file.get("defaults", {})),
+                "jobs": make_paths_absolute(job_file["jobs"])}
+    job = dict(job_file)
+    for key in path_keys:
+        if isinstance(job.get(key), list):
+            job[key] = [os.path.abspath(path) for path in job[key]]
+        elif job.get(key) is not None:
+            job[key] = os.path.abspath(job[key])
+    return job
+
+
+def main(argv):
+    if len(argv) < 2:
+        print("usage: python RenderClient.py job.json [--port N] [-o output_file]")
+        return
+    # reading the job file like the '-j' flag does. JobManager imports netCDF4, so it is imported only here
+    import JobManager
+    job_file = JobManager.load_job_file(argv[1])
+    port = int(argv[argv.index('--port') + 1]) if '--port' in argv else default_port
+    output_path = argv[argv.index('-o') + 1] if '-o' in argv else None
+    result = submit(job_file, port, output_path)
+    for fig_file_name in result["files"]:
+        print(fig_file_name)
+    if "seconds" in result:
+        print("made in", round(result["seconds"], 3), "seconds")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
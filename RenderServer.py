@@ -0,0 +1,185 @@
+"""
+Welcome to Render Server.
+This module runs a long running local service that makes figures from jobs, so the cost of starting the program -
+importing matplotlib, Basemap and netCDF4, opening the netCDF file and building the map base - is paid only once, and a
+request costs only the drawing of its figure.
+
+algorithm: serve() listens on a port of 127.0.0.1 (the server can't be reached from other computers). Every request is
+a job file's content (one job, a list of jobs, or a dictionary with "jobs" and "defaults", see JobManager), and every
+job runs with JobManager.run_job(). The netCDF files stay open between requests, and are opened again when they
+change. The map bases stay in omnom.map_base_cache, and the metadata indexes in the netCDF_file_handler's cache, so a
+job with the same domain as an earlier job builds nothing but its figure. Like the open netCDF files, the map bases are
+an OrderedDict of the least recently used first, of at most omnom.max_map_bases, so the memory of a long running
+server does not grow with every new domain. The requests are served one after the other,
+as matplotlib can't draw from a few threads at once.
+
+requests:
+POST /render - runs the jobs, and answers with the names of the figures' files, {"files": [...], "seconds": ...}
+POST /render?image=1 - runs one job that makes one figure, and answers with the figure's file itself
+GET /status - the open netCDF files and the number of cached map bases
+
+call_example:
+python main.py --serve 8765
+python RenderClient.py job.json
+"""
+
+import glob
+import json
+import mimetypes
+import os
+import time
+from collections import OrderedDict
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import netCDF_file_handler as nfh
+import JobManager
+# the modules that draw the figures are imported with the server, and not by the first request
+import omnom
+import ognom
+import mpl_toolkits.basemap
+
+# the port the server listens on, when no other port is given
+default_port = 8765
+
+# the maximum number of netCDF files that are kept open between requests
+max_open_netcdf_files = 16
+
+# the open netCDF files, by their path, from the least recently used. every value is (netcdf_file, file_key)
+open_netcdf_files = OrderedDict()
+
+
+def serve(port=default_port):
+    """
+    :param port: the port to listen on
+
+    about: running the render server until it is stopped with ctrl+c. Only local clients can reach it.
+    """
+    server = HTTPServer(("127.0.0.1", port), RenderRequestHandler)
+    print("render server listening on http://127.0.0.1:" + str(port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    close_netcdf_files()
+
+
+def render(job_file):
+    """
+    :param job_file: the content of a job file: one job, a list of jobs, or a dictionary with "jobs" and "defaults"
+    :return: a dictionary with the names of the figures' files, and the time it took to make them in seconds
+
+    about: running the jobs with the netCDF files that are kept open between requests
+    """
+    start_time = time.perf_counter()
+    fig_file_names = []
+    for job in JobManager.get_jobs(job_file):
+        if "bundle_path" in job:
+            fig_file_names += JobManager.run_job(job)
+            continue
+        if "netcdf_path" not in job:
+            raise Exception("job has no netcdf_path")
+        fig_file_names += JobManager.run_job(job, get_netcdf_file(job["netcdf_path"]))
+    return {"files": fig_file_names, "seconds": time.perf_counter() - start_time}
+
+
+def get_netcdf_file(netcdf_path):
+    """
+    :param netcdf_path: the path of the netCDF file, a glob pattern or a list of paths, as in nfh.open_netcdf()
+    :return: the open netCDF file
+
+    about: the netCDF files are opened once and kept open between requests. A file that was changed since it was
+    opened (or a glob pattern that matches other files now) is closed and opened again.
+    """
+    key = json.dumps(netcdf_path)
+    file_key = get_netcdf_file_key(netcdf_path)
+    if key in open_netcdf_files:
+        netcdf_file, open_file_key = open_netcdf_files.pop(key)
+        if open_file_key == file_key:
+            open_netcdf_files[key] = (netcdf_file, file_key)
+            return netcdf_file
+        netcdf_file.close()
+
+    netcdf_file = nfh.open_netcdf(netcdf_path)
+    open_netcdf_files[key] = (netcdf_file, file_key)
+    # closing the least recently used files
+    while len(open_netcdf_files) > max_open_netcdf_files:
+        open_netcdf_files.popitem(last=False)[1][0].close()
+    return netcdf_file
+
+
+def get_netcdf_file_key(netcdf_path):
+    """
+    :param netcdf_path: the path of the netCDF file, a glob pattern or a list of paths
+    :return: the path, modification time and size of every file of the dataset
+
+    call_example:
+    get_netcdf_file_key('data\\msl.nc')
+    -> [['C:\\NOM\\data\\msl.nc', 1633036800.0, 24912000]]
+    """
+    if isinstance(netcdf_path, list):
+        paths = netcdf_path
+    elif any(glob_char in netcdf_path for glob_char in "*?["):
+        paths = sorted(glob.glob(netcdf_path))
+    else:
+        paths = [netcdf_path]
+    file_key = []
+    for path in paths:
+        file_stat = os.stat(path)
+        file_key.append([os.path.abspath(path), file_stat.st_mtime, file_stat.st_size])
+    return file_key
+
+
+def close_netcdf_files():
+    """
+    about: closing all the netCDF files that are kept open
+    """
+    while open_netcdf_files:
+        open_netcdf_files.popitem()[1][0].close()
+
+
+# a class that answers the requests of the render server
+class RenderRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/status":
+            self.send_json({"error": "unknown request " + self.path}, 404)
+            return
+        self.send_json({"open_files": [json.loads(key) for key in open_netcdf_files],
+                        "map_bases": len(omnom.map_base_cache)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self.send_json({"error": "unknown request " + self.path}, 404)
+            return
+        is_image = parse_qs(url.query).get("image", ["0"])[0] == "1"
+        try:
+            job_file = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            result = render(job_file)
+            if is_image and len(result["files"]) != 1:
+                raise Exception("an image is returned only for one figure, the jobs made " +
+                                str(len(result["files"])))
+        except Exception as error:
+            self.send_json({"error": str(error)}, 400)
+            return
+
+        if not is_image:
+            self.send_json(result)
+            return
+        with open(result["files"][0], "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(result["files"][0])[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Fig-File", result["files"][0])
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, value, status=200):
+        body = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,90 @@
+"""
+Welcome to the import time benchmark.
+This script measures how long it takes to import every module of the program, and fails when a module takes longer
+than its budget, or imports a heavy module it should import only when it is used (Basemap, pyplot or prompt_toolkit).
+
+algorithm: every module is imported in a new python process with 'python -X importtime', that prints the time every
+import took to stderr. The cumulative time of the module's own line is its import time, and the other lines are the
+modules it imported. Every module is imported a few times, and the fastest time is kept, so the first import, that
+reads the files from the disk, does not count.
+
+call_example:
+python benchmarks/import_time.py
+python benchmarks/import_time.py --repeat 5
+"""
+
+import os
+import subprocess
+import sys
+
+# the directory of the program's modules
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the maximum import time in seconds of every module
+import_budgets = {"netCDF_file_handler": 0.4, "InputManager": 0.4, "OutputManager": 0.3, "JobManager": 0.4,
+                  "ognom": 0.4, "omnom": 0.4, "main": 0.4, "RenderClient": 0.1}
+
+# the heavy modules that every module must not import. they are imported by the functions that use them
+forbidden_imports = {"netCDF_file_handler": ["matplotlib", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "InputManager": ["matplotlib", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "OutputManager": ["matplotlib.pyplot", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "JobManager": ["matplotlib.pyplot", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "ognom": ["matplotlib.pyplot", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "omnom": ["matplotlib.pyplot", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "main": ["matplotlib.pyplot", "mpl_toolkits.basemap", "prompt_toolkit"],
+                     "RenderClient": ["numpy", "netCDF4", "matplotlib"]}
+
+
+def measure_import(module_name):
+    """
+    :param module_name: the name of the module to import
+    :return: the import time of the module in seconds, and the names of all the modules it imported
+
+    about: importing the module in a new python process with 'python -X importtime'
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module_name],
+                             cwd=package_directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode != 0:
+        raise Exception("importing " + module_name + " failed:\n" + process.stderr)
+
+    # every line is 'import time: self [us] | cumulative | imported package', the package is indented by its depth
+    import_time = None
+    imported_modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, imported_module = line[len("import time:"):].split("|")
+        imported_modules.append(imported_module.strip())
+        if imported_module.strip() == module_name:
+            import_time = int(cumulative) / 1e6
+    return import_time, imported_modules
+
+
+def run_benchmark(repeat=3):
+    """
+    :param repeat: the number of times every module is imported
+    :return: a list of the modules that failed, with the reason
+
+    about: measuring every module in import_budgets, and printing its fastest import time and budget
+    """
+    failures = []
+    for module_name, budget in import_budgets.items():
+        measures = [measure_import(module_name) for _ in range(repeat)]
+        import_time = min(measure[0] for measure in measures)
+        imported_modules = measures[0][1]
+        print(module_name.ljust(20), str(round(import_time, 3)).ljust(8), "budget", budget)
+        if import_time > budget:
+            failures.append(module_name + " took " + str(round(import_time, 3)) + " seconds, over its budget of " +
+                            str(budget))
+        for forbidden_module in forbidden_imports.get(module_name, []):
+            if forbidden_module in imported_modules:
+                failures.append(module_name + " imports " + forbidden_module)
+    return failures
+
+
+if __name__ == "__main__":
+    failures = run_benchmark(int(sys.argv[sys.argv.index('--repeat') + 1]) if '--repeat' in sys.argv else 3)
+    for failure in failures:
+        print("FAILED:", failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,287 @@
+"""
+Welcome to the pipeline benchmark.
+This script measures the stages of making a map - reading the field, arranging it, making the map base and making the
+whole map - on synthetic netCDF files of a few sizes and layouts, and saves the wall time and peak memory of every
+stage to a JSON file, so two versions of the program can be compared.
+
+algorithm: make_synthetic_netcdf() writes a netCDF file for every layout (the order of the dimensions of the field),
+size and storage (contiguous, chunked, or chunked and compressed) to the data directory, once. Then every stage of
+every file is measured in a new python process, so the peak memory (the peak RSS) of a stage is not hidden by the
+stages before it. A stage runs a few times and its fastest and median wall times are kept. The map base cache is
+turned off, and emptied before every run, so make_map_base and make_map always build their map base.
+
+stages:
+get_values - nfh.get_values() of the whole field
+arrange_fields - omnom.arrange_fields() of the whole field to time, depth, lat, lon
+make_map_base - omnom.make_map_base() on a headless figure
+make_map - omnom.make_map() on a headless figure, and rendering the figure to pixels
+
+call_example:
+python benchmarks/pipeline.py --output new.json
+python benchmarks/pipeline.py --sizes small,large --repeat 5 --output new.json --compare old.json
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# the directory of the program's modules
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, package_directory)
+import Instrumentation
+
+# the orders of the dimensions of the synthetic field
+layouts = {"time_lat_lon": ["time", "lat", "lon"], "lat_time_lon": ["lat", "time", "lon"],
+           "time_depth_lat_lon": ["time", "depth", "lat", "lon"], "lat_depth_time_lon": ["lat", "depth", "time", "lon"]}
+
+# the sizes of the dimensions of the synthetic files, a 1 degree and a 0.25 degree global grid
+sizes = {"small": {"time": 24, "depth": 4, "lat": 181, "lon": 360},
+         "large": {"time": 8, "depth": 4, "lat": 721, "lon": 1440}}
+
+# the ways the field is stored: contiguous, chunked by lat-lon slabs, and chunked and compressed with zlib
+storages = ["contiguous", "chunked", "compressed"]
+
+# the size of the lat and lon sides of the chunks of the chunked and compressed files
+chunk_side = 256
+
+# the stages that are measured
+stages = ["get_values", "arrange_fields", "make_map_base", "make_map"]
+
+# the resolution of the coastlines of the maps
+map_resolution = "c"
+
+# a stage that got slower (or uses more memory) by more than this ratio is printed as a regression by --compare
+regression_ratio = 1.2
+
+
+def make_synthetic_netcdf(path_to_file, layout, size, storage):
+    """
+    :param path_to_file: the path of the netCDF file to write
+    :param layout: a key of layouts, the order of the dimensions of the field
+    :param size: a key of sizes
+    :param storage: one of storages
+
+    about: writing a netCDF file with a smooth temperature like field 't' with a little noise, so it compresses like
+    real data does, and the coordinate variables of its dimensions
+    """
+    import numpy as np
+    import netCDF4 as nc
+
+    dimensions = layouts[layout]
+    dimension_sizes = sizes[size]
+    random_generator = np.random.default_rng(0)
+    with nc.Dataset(path_to_file, "w") as netcdf_file:
+        for dim_name in dimensions:
+            netcdf_file.createDimension(dim_name, dimension_sizes[dim_name])
+        coordinates = {"time": np.arange(dimension_sizes["time"], dtype=np.float64) * 6,
+                       "depth": np.linspace(0, 1000, dimension_sizes["depth"]),
+                       "lat": np.linspace(-90, 90, dimension_sizes["lat"]),
+                       "lon": np.linspace(0, 360, dimension_sizes["lon"], endpoint=False)}
+        for dim_name in dimensions:
+            coordinate_variable = netcdf_file.createVariable(dim_name, "f8", (dim_name,))
+            coordinate_variable[:] = coordinates[dim_name]
+        netcdf_file["time"].units = "hours since 2000-01-01 00:00:00"
+        netcdf_file["time"].calendar = "standard"
+
+        # chunks of one lat-lon slab, the way maps read the field
+        chunk_sizes = [min(chunk_side, dimension_sizes[dim_name]) if dim_name in ["lat", "lon"] else 1
+                       for dim_name in dimensions]
+        field = netcdf_file.createVariable("t", "f4", dimensions, contiguous=storage == "contiguous",
+                                           chunksizes=None if storage == "contiguous" else chunk_sizes,
+                                           zlib=storage == "compressed", shuffle=storage == "compressed")
+
+        # writing the field one time value at a time
+        lat, lon = np.meshgrid(np.radians(coordinates["lat"]), np.radians(coordinates["lon"]), indexing="ij")
+        other_dimensions = [dim_name for dim_name in dimensions if dim_name != "time"]
+        for time_index in range(dimension_sizes["time"]):
+            slab = 250 + 40 * np.cos(lat) + 5 * np.sin(2 * lon + time_index / 4)
+            if "depth" in dimensions:
+                slab = slab[np.newaxis] - 10 * np.arange(dimension_sizes["depth"])[:, np.newaxis, np.newaxis]
+            slab = slab + random_generator.normal(0, 0.1, slab.shape)
+            # the slab is in depth, lat, lon order, and is written in the order of the field's dimensions
+            slab_dimensions = [dim_name for dim_name in ["depth", "lat", "lon"] if dim_name in dimensions]
+            slab = np.transpose(slab, [slab_dimensions.index(dim_name) for dim_name in other_dimensions])
+            index = tuple(time_index if dim_name == "time" else slice(None) for dim_name in dimensions)
+            field[index] = slab.astype(np.float32)
+
+
+def make_job(path_to_file, layout):
+    """
+    :param path_to_file: the path of the synthetic netCDF file
+    :param layout: a key of layouts
+    :return: a job of the file's map, for JobManager.make_commands_list()
+    """
+    job = {"netcdf_path": path_to_file, "lat": "lat", "lon": "lon", "time": "time", "scalar_field": "t",
+           "resolution": map_resolution, "fig_format": "png", "fig_location": tempfile.gettempdir(),
+           "name_of_fig": "nom_benchmark"}
+    if "depth" in layouts[layout]:
+        job["depth"] = "depth"
+    return job
+
+
+def run_stage(path_to_file, layout, stage, repeat):
+    """
+    :param path_to_file: the path of the synthetic netCDF file
+    :param layout: a key of layouts
+    :param stage: one of stages
+    :param repeat: the number of times the stage runs
+    :return: a dictionary with the wall times of the runs in seconds, and the peak RSS before and after the stage
+
+    about: running one stage of one file in the current process. it is called by measure_stage() in a new process
+    """
+    import netCDF_file_handler as nfh
+    import JobManager
+    import OutputManager
+    import omnom
+
+    omnom.map_base_cache_directory = None
+    netcdf_file = nfh.open_netcdf(path_to_file)
+    commands_list = JobManager.make_commands_list(make_job(path_to_file, layout), netcdf_file)
+    field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, "t", commands_list)
+    field = nfh.get_values(netcdf_file, "t") if stage == "arrange_fields" else None
+    start_peak_rss = Instrumentation.get_peak_rss()
+
+    seconds = []
+    for _ in range(repeat):
+        omnom.map_base_cache.clear()
+        plt_figure = OutputManager.make_headless_figure() if stage in ["make_map_base", "make_map"] else None
+        start_time = time.perf_counter()
+        if stage == "get_values":
+            nfh.get_values(netcdf_file, "t")
+        elif stage == "arrange_fields":
+            omnom.arrange_fields(field, commands_list, field_indexes)
+        elif stage == "make_map_base":
+            omnom.make_map_base(netcdf_file, commands_list, plt_figure.gca())
+        else:
+            omnom.make_map(netcdf_file, commands_list, plt_figure.gca())
+            plt_figure.canvas.draw()
+        seconds.append(time.perf_counter() - start_time)
+        if plt_figure is not None:
+            OutputManager.release_fig(plt_figure)
+
+    netcdf_file.close()
+    return {"seconds": seconds, "start_peak_rss_bytes": start_peak_rss,
+            "peak_rss_bytes": Instrumentation.get_peak_rss()}
+
+
+def measure_stage(path_to_file, layout, stage, repeat):
+    """
+    :param path_to_file: the path of the synthetic netCDF file
+    :param layout: a key of layouts
+    :param stage: one of stages
+    :param repeat: the number of times the stage runs
+    :return: the result of run_stage() in a new python process
+    """
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-stage", path_to_file, layout, stage,
+                              str(repeat)], cwd=package_directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode != 0:
+        raise Exception("the " + stage + " stage of " + path_to_file + " failed:\n" + process.stderr)
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def run_benchmark(size_names, repeat, data_directory):
+    """
+    :param size_names: the keys of sizes to measure
+    :param repeat: the number of times every stage runs
+    :param data_directory: the directory of the synthetic netCDF files. files that are already there are used again
+    :return: a dictionary with the details of the run and a list of the results, one for every file and stage
+    """
+    os.makedirs(data_directory, exist_ok=True)
+    results = []
+    for size in size_names:
+        for layout in layouts:
+            for storage in storages:
+                path_to_file = os.path.join(data_directory, "_".join([size, layout, storage]) + ".nc")
+                if not os.path.exists(path_to_file):
+                    make_synthetic_netcdf(path_to_file, layout, size, storage)
+                for stage in stages:
+                    stage_result = measure_stage(path_to_file, layout, stage, repeat)
+                    result = {"size": size, "layout": layout, "storage": storage, "stage": stage,
+                              "min_seconds": min(stage_result["seconds"]),
+                              "median_seconds": statistics.median(stage_result["seconds"]),
+                              "start_peak_rss_bytes": stage_result["start_peak_rss_bytes"],
+                              "peak_rss_bytes": stage_result["peak_rss_bytes"]}
+                    print(get_result_name(result).ljust(52), str(round(result["median_seconds"], 4)).ljust(8),
+                          "peak RSS MiB", round(result["peak_rss_bytes"] / 2 ** 20) if result["peak_rss_bytes"]
+                          else "-")
+                    results.append(result)
+    return {"commit": get_commit(), "python": platform.python_version(), "platform": platform.platform(),
+            "repeat": repeat, "results": results}
+
+
+def get_result_name(result):
+    """
+    :param result: one of the results of run_benchmark()
+    :return: the name of the result's file and stage
+
+    call_example:
+    get_result_name({"size": "small", "layout": "time_lat_lon", "storage": "chunked", "stage": "get_values", ...})
+    -> 'small time_lat_lon chunked get_values'
+    """
+    return " ".join([result["size"], result["layout"], result["storage"], result["stage"]])
+
+
+def get_commit():
+    """
+    :return: the git commit of the program's directory, or None if it is not a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=package_directory, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_benchmarks(old_benchmark, new_benchmark):
+    """
+    :param old_benchmark: the result of run_benchmark() of the old version
+    :param new_benchmark: the result of run_benchmark() of the new version
+    :return: a list of the regressions, the results that got slower or use more memory by more than regression_ratio
+
+    about: comparing the median wall time and the peak RSS of every file and stage that are in both benchmarks
+    """
+    old_results = {get_result_name(result): result for result in old_benchmark["results"]}
+    regressions = []
+    for new_result in new_benchmark["results"]:
+        old_result = old_results.get(get_result_name(new_result))
+        if old_result is None:
+            continue
+        for key in ["median_seconds", "peak_rss_bytes"]:
+            if old_result[key] and new_result[key] and new_result[key] > old_result[key] * regression_ratio:
+                regressions.append(get_result_name(new_result) + " " + key + ": " + str(old_result[key]) + " -> " +
+                                   str(new_result[key]))
+    return regressions
+
+
+if __name__ == "__main__":
+    if '--run-stage' in sys.argv:
+        stage_index = sys.argv.index('--run-stage')
+        path_to_file, layout, stage, repeat = sys.argv[stage_index + 1:stage_index + 5]
+        stage_result = run_stage(path_to_file, layout, stage, int(repeat))
+        # on a line of its own, as Basemap prints warnings without ending their line
+        print("\n" + json.dumps(stage_result))
+        sys.exit(0)
+
+    size_names = sys.argv[sys.argv.index('--sizes') + 1].split(",") if '--sizes' in sys.argv else ["small"]
+    repeat = int(sys.argv[sys.argv.index('--repeat') + 1]) if '--repeat' in sys.argv else 3
+    data_directory = sys.argv[sys.argv.index('--data-directory') + 1] if '--data-directory' in sys.argv else \
+        os.path.join(tempfile.gettempdir(), "nom_benchmark")
+    output_path = sys.argv[sys.argv.index('--output') + 1] if '--output' in sys.argv else "benchmark_results.json"
+
+    benchmark = run_benchmark(size_names, repeat, data_directory)
+    with open(output_path, "w") as f:
+        json.dump(benchmark, f, indent=1)
+    print("saved to", output_path)
+
+    if '--compare' in sys.argv:
+        with open(sys.argv[sys.argv.index('--compare') + 1]) as f:
+            regressions = compare_benchmarks(json.load(f), benchmark)
+        for regression in regressions:
+            print("REGRESSION:", regression)
+        sys.exit(1 if regressions else 0)
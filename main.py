@@ -1,15 +1,54 @@
-import matplotlib.pyplot as plt
-import omnom
-import ognom
+import sys
+import numpy as np
+
+# searching what parameters the program got.
+# in headless mode the program never uses an interactive backend, so it is chosen before pyplot is imported
+is_headless = '--headless' in sys.argv or '--serve' in sys.argv
+if is_headless:
+    import matplotlib
+    matplotlib.use('Agg')
+
+# pyplot, omnom (that imports Basemap) and ognom are imported only when they are used, so a job file of graphs never
+# imports Basemap, and nothing that draws is imported before the questions are answered
 from InputManager import MapCommandsList, GraphCommandsList, CommandsList
 import InputManager
 import netCDF_file_handler as nfh
-import sys
 import OutputManager
+import Instrumentation
 
-# searching what parameters the program got.
 if '-i' in sys.argv:
     InputManager.is_reading_from_file = True
+# the corners of the map are asked for only with the '--ask-corners' flag, so existing answer scripts keep their order
+if '--ask-corners' in sys.argv:
+    InputManager.is_asking_map_corners = True
+# the number of processes to make the maps with, given after the '-p' flag
+processes = 1
+if '-p' in sys.argv:
+    processes = int(sys.argv[sys.argv.index('-p') + 1])
+# the values are read as float32 unless full precision is asked for with the '--float64' flag
+if '--float64' in sys.argv:
+    nfh.values_dtype = np.float64
+# the number of frames whose data is read ahead while a frame is drawn, given after the '--prefetch' flag. It is set
+# here, so it applies to interactive runs, job files and the render server alike
+if '--prefetch' in sys.argv:
+    import omnom
+    omnom.prefetch_depth = int(sys.argv[sys.argv.index('--prefetch') + 1])
+# maps of grids with more points than pixels are drawn in a lower level of detail, unless the '--full-resolution' flag
+# is given
+is_full_resolution = '--full-resolution' in sys.argv
+# the time, size and chunks of the reads from the netCDF file are recorded and printed with the '--read-timings' flag
+if '--read-timings' in sys.argv:
+    nfh.is_timing_reads = True
+# the slabs of the maps are read from the memory mapped slice cache with the '--slice-cache' flag
+if '--slice-cache' in sys.argv:
+    nfh.is_using_slice_cache = True
+# the time, bytes read and peak memory of every stage are recorded, and saved as a JSON summary to the file given after
+# the '--instrument' flag, or as a chrome trace to the file given after the '--trace' flag. the peak memory python
+# allocated in every stage is traced with tracemalloc only with the '--trace-memory' flag, as it slows everything down
+instrument_file_name = sys.argv[sys.argv.index('--instrument') + 1] if '--instrument' in sys.argv else None
+trace_file_name = sys.argv[sys.argv.index('--trace') + 1] if '--trace' in sys.argv else None
+if instrument_file_name is not None or trace_file_name is not None:
+    Instrumentation.start_recording('--trace-memory' in sys.argv)
 
 
 def main():
@@ -27,36 +66,81 @@ def main():
     # asking for the plot type
     commands_list = InputManager.get_plot_type(script, commands_list)
 
-    # opening the figure we want to create
-    plt_figure = plt.figure()
+    # opening the figure we want to create. in headless mode it is not managed by pyplot
+    if is_headless:
+        plt_figure = OutputManager.make_headless_figure()
+    else:
+        import matplotlib.pyplot as plt
+        plt_figure = plt.figure()
 
     # splitting the cases for different types of plots
     if commands_list.plot_type == 0:
         # Converting the commands_list object from CommandsList type to MapCommandsList type
         commands_list = MapCommandsList(commands_list)
+        commands_list.is_full_resolution = is_full_resolution
         # asking the user about the map's properties
         InputManager.get_map_choose_parameters(netcdf_file, script, commands_list)
-        # making the map
-        omnom.make_map(netcdf_file, commands_list)
     else:
         # Converting the commands_list object from CommandsList type to GraphCommandsList type
         commands_list = GraphCommandsList(commands_list)
         # asking the user about the graph's properties
         InputManager.get_graph_choose_parameters(netcdf_file, script, commands_list)
         # making the graph
-        ognom.make_graph_2d(netcdf_file, commands_list)
+        import ognom
+        ognom.make_graph_2d(netcdf_file, commands_list, plt_figure.gca())
     print("\n")
     # getting from the user the output's full name
     commands_list = InputManager.get_plot_name_location_and_format(script, commands_list)
     # printing the script file if asked
     OutputManager.print_script_to_file(script, commands_list)
-    # saving the fig
-    OutputManager.print_fig(plt_figure, commands_list)
+    if commands_list.plot_type == 0:
+        import omnom
+    # the frames of an animation are written to one file in their order, so they are made in one process, and so are
+    # bundles, that are saved without drawing
+    if commands_list.plot_type == 0 and processes > 1 and \
+            commands_list.fig_format not in OutputManager.animation_formats + [OutputManager.bundle_format]:
+        # making and saving a map for every time and depth value that was asked for, with a few processes
+        omnom.make_map_frames_parallel(commands_list, max_workers=processes)
+    elif commands_list.plot_type == 0:
+        # making and saving the map, a map for every time and depth value that was asked for
+        omnom.make_map_frames(netcdf_file, commands_list, plt_figure)
+    else:
+        # saving the fig
+        OutputManager.print_fig(plt_figure, commands_list)
     # closing the netCDF file
     netcdf_file.close()
+    if nfh.is_timing_reads:
+        for reads_name, reads_summary in nfh.summarize_read_timings().items():
+            print(reads_name, reads_summary)
     print("\nEND")
-    plt.show()
+    if is_headless:
+        OutputManager.release_fig(plt_figure)
+    else:
+        import matplotlib.pyplot as plt
+        plt.show()
 
 
 if __name__ == "__main__":
-    main()
+    # jobs and the render server's jobs draw every grid point with the '--full-resolution' flag too, unless a job has its
+    # own "is_full_resolution" key
+    if '-j' in sys.argv or '--serve' in sys.argv:
+        import JobManager
+        JobManager.is_full_resolution = is_full_resolution
+    # running the jobs of the job file given after the '-j' flag, without asking any question
+    if '-j' in sys.argv:
+        JobManager.run_job_file(sys.argv[sys.argv.index('-j') + 1])
+    # running the render server, on the port given after the '--serve' flag
+    elif '--serve' in sys.argv:
+        import RenderServer
+        serve_index = sys.argv.index('--serve')
+        if serve_index + 1 < len(sys.argv) and sys.argv[serve_index + 1].isdigit():
+            RenderServer.serve(int(sys.argv[serve_index + 1]))
+        else:
+            RenderServer.serve()
+    else:
+        main()
+    # saving the records of the stages
+    if instrument_file_name is not None:
+        Instrumentation.write_summary(instrument_file_name)
+    if trace_file_name is not None:
+        Instrumentation.write_chrome_trace(trace_file_name)
@@ -7,7 +7,55 @@ the file, and to get better understanding of it.
 import netCDF4 as nc
 import numpy as np
 from enum import Enum
-from typing import Optional
+from typing import Optional, List
+import os
+import json
+import hashlib
+import glob
+import copy
+import time
+from collections import OrderedDict
+import Instrumentation
+
+
+# the floating point type the values are read in. float32 keeps the memory of float32 and packed int16 variables small,
+# it can be set to np.float64 when full precision is needed
+values_dtype = np.float32
+
+# the metadata indexes of netCDF files, by path. they are also saved to a sidecar file next to every netCDF file
+metadata_indexes = {}
+
+# the directory of the metadata indexes of netCDF files that a sidecar file can't be written next to
+metadata_cache_directory = os.path.join(os.path.expanduser("~"), ".nom_cache", "metadata")
+
+# the most memory the chunk cache of one variable can take
+max_chunk_cache_bytes = 256 * 2 ** 20
+
+# the preemption of fully read chunks from the chunk cache, by access pattern. A scan never reads a chunk again, so its
+# chunks are the first to leave the cache
+access_pattern_preemptions = {"map": 0.75, "series": 0.75, "scan": 1.0}
+
+# if the time, size and chunks of every read are recorded in read_timings
+is_timing_reads = False
+
+# the records of the reads from the netCDF files, when is_timing_reads is True
+read_timings = []
+
+# if the lat-lon slabs of the maps are read from the slice cache: a copy of every variable that is drawn, saved once
+# uncompressed in time, depth, lat, lon order to a .npy file that is memory mapped
+is_using_slice_cache = False
+
+# the directory of the slice cache's files
+slice_cache_directory = os.path.join(os.path.expanduser("~"), ".nom_cache", "slices")
+
+# the most disk space the slice cache's files can take. the least recently used files are deleted to make room
+max_slice_cache_bytes = 4 * 2 ** 30
+
+# the maximum size in bytes of the values read from the netCDF file at once while a variable is saved to the slice cache
+slice_cache_write_bytes = 64 * 2 ** 20
+
+# the memory mapped slice cache files that are open in the running process, by file name
+slice_caches = {}
 
 
 # a class that contains the three types of variables in the netCDF
@@ -20,15 +68,270 @@ class Labels(Enum):
 # gets path as raw string
 def open_netcdf(path_to_file):
     """
-    :param path_to_file: the path for the netCDF file as a string
+    :param path_to_file: the path for the netCDF file as a string. A glob pattern (with *, ? or [) or a list of paths
+    opens all the files as one dataset, aggregated along their time dimension. A path of a file that exists is opened as
+    it is, even if its name has these characters
     :return: the netcdf file
 
     about: this function opens the netCDF file
+
+    call_example:
+    open_netcdf('data\\psl_6hrPlev_reanalysis_ERA5_2010*.nc')
+    opens the monthly files of 2010 as one dataset with all the time values of the year
     """
+    if isinstance(path_to_file, list):
+        return AggregatedDataset(path_to_file)
+    if not os.path.exists(path_to_file) and any(glob_char in path_to_file for glob_char in "*?["):
+        paths = sorted(glob.glob(path_to_file))
+        if not paths:
+            raise Exception("no netCDF files match " + path_to_file)
+        return AggregatedDataset(paths)
     netcdf_file = nc.Dataset(path_to_file)
     return netcdf_file
 
 
+# a class of a few netCDF files with the same structure, that are used as one dataset, concatenated along their time (or
+# another aggregation) dimension. Only the files that hold the values being read are opened, and no more than
+# max_open_files files are kept open at once.
+class AggregatedDataset:
+    paths: List[str]  # the paths of the netCDF files, by the order of their time values
+    aggregation_dimension: Optional[str]  # the name of the dimension the files are concatenated along
+    max_open_files: int  # the maximum number of files that are kept open
+    open_files: OrderedDict  # the open files, by their index in paths, from the least recently used
+    file_offsets: Optional[np.ndarray]  # the global index of the first value of every file in the aggregation dimension
+    variables: OrderedDict  # the AggregatedVariable objects, by name
+    aggregated_metadata_index: Optional[dict]  # the metadata index of the whole dataset
+
+    def __init__(self, paths, aggregation_dimension=None, max_open_files=8):
+        self.paths = list(paths)
+        self.aggregation_dimension = aggregation_dimension
+        self.max_open_files = max_open_files
+        self.open_files = OrderedDict()
+        self.file_offsets = None
+        self.variables = OrderedDict()
+        self.aggregated_metadata_index = None
+
+        # finding the aggregation dimension: the unlimited dimension of the first file, or time
+        first_file_dimensions = get_metadata_index(self.paths[0])["dimensions"]
+        if self.aggregation_dimension is None:
+            unlimited_dimensions = [dim_name for dim_name, dim in first_file_dimensions.items() if dim["is_unlimited"]]
+            self.aggregation_dimension = unlimited_dimensions[0] if unlimited_dimensions else "time"
+        if self.aggregation_dimension not in first_file_dimensions:
+            raise Exception("aggregation dimension " + self.aggregation_dimension + " not found in " + self.paths[0])
+
+        for var_name in get_metadata_index(self.paths[0])["variables"]:
+            self.variables[var_name] = AggregatedVariable(self, var_name)
+
+    def __getitem__(self, field_name):
+        return self.variables[field_name]
+
+    def get_file(self, file_number):
+        """
+        :param file_number: the index of the file in paths
+        :return: the open netCDF file
+
+        about: opening a file, or taking it from the open files. When there are too many open files, the least recently
+        used one is closed.
+        """
+        if file_number in self.open_files:
+            self.open_files.move_to_end(file_number)
+        else:
+            self.open_files[file_number] = nc.Dataset(self.paths[file_number])
+        while len(self.open_files) > self.max_open_files:
+            self.open_files.popitem(last=False)[1].close()
+        return self.open_files[file_number]
+
+    def get_file_offsets(self):
+        """
+        :return: an array with the global index of the first value of every file in the aggregation dimension, and the
+        total size at the end
+
+        about: building the index from global index to file and local index, the first time it is needed. The sizes of
+        the files are taken from their metadata indexes, so files with an up to date index are not opened.
+        """
+        if self.file_offsets is None:
+            file_sizes = [get_metadata_index(path)["dimensions"][self.aggregation_dimension]["size"]
+                          for path in self.paths]
+            self.file_offsets = np.concatenate([[0], np.cumsum(file_sizes)]).astype(int)
+        return self.file_offsets
+
+    def find_file(self, global_index):
+        """
+        :param global_index: an index in the aggregation dimension of the whole dataset
+        :return: the index of the file that holds global_index, and the index inside this file
+        """
+        file_offsets = self.get_file_offsets()
+        file_number = int(np.searchsorted(file_offsets, global_index, side="right")) - 1
+        return file_number, global_index - int(file_offsets[file_number])
+
+    def get_metadata_index(self):
+        """
+        :return: the metadata index of the whole dataset
+
+        about: the metadata index of the first file, with the size of the aggregation dimension, and the shapes and
+        coordinate ranges of the variables that depend on it, of all the files together
+        """
+        if self.aggregated_metadata_index is None:
+            file_indexes = [get_metadata_index(path) for path in self.paths]
+            metadata_index = copy.deepcopy(file_indexes[0])
+            total_size = int(self.get_file_offsets()[-1])
+            metadata_index["dimensions"][self.aggregation_dimension]["size"] = total_size
+            for var_name, var_metadata in metadata_index["variables"].items():
+                if self.aggregation_dimension in var_metadata["dimensions"]:
+                    var_metadata["shape"][var_metadata["dimensions"].index(self.aggregation_dimension)] = total_size
+                    var_metadata["size"] = int(np.prod(var_metadata["shape"]))
+                if "min" in var_metadata:
+                    var_metadata["min"] = min(file_index["variables"][var_name]["min"] for file_index in file_indexes)
+                    var_metadata["max"] = max(file_index["variables"][var_name]["max"] for file_index in file_indexes)
+            metadata_index.pop("file_key", None)
+            self.aggregated_metadata_index = metadata_index
+        return self.aggregated_metadata_index
+
+    def close(self):
+        for netcdf_file in self.open_files.values():
+            netcdf_file.close()
+        self.open_files.clear()
+
+
+# a class of a variable of an AggregatedDataset. It can be indexed like a netCDF4 variable object, and reads from every
+# file only the part of the index it holds.
+class AggregatedVariable:
+    dataset: AggregatedDataset
+    name: str
+    mask: bool  # if the values are masked, like netCDF4's set_auto_mask
+    scale: bool  # if the values are unpacked, like netCDF4's set_auto_scale
+    chunk_cache: Optional[tuple]  # the (size, nelems, preemption) chunk cache of the files' variables
+
+    def __init__(self, dataset, name):
+        self.dataset = dataset
+        self.name = name
+        self.mask = True
+        self.scale = True
+        self.chunk_cache = None
+
+    def __repr__(self):
+        return "aggregated variable " + self.name + str(self.dimensions) + ", shape " + str(self.shape) + ", over " + \
+               str(len(self.dataset.paths)) + " files"
+
+    def get_metadata(self):
+        return self.dataset.get_metadata_index()["variables"][self.name]
+
+    @property
+    def dimensions(self):
+        return tuple(self.get_metadata()["dimensions"])
+
+    @property
+    def shape(self):
+        return tuple(self.get_metadata()["shape"])
+
+    @property
+    def size(self):
+        return self.get_metadata()["size"]
+
+    @property
+    def ndim(self):
+        return len(self.dimensions)
+
+    @property
+    def dtype(self):
+        return np.dtype(self.get_metadata()["dtype"])
+
+    @property
+    def datatype(self):
+        return self.get_file_variable(0).datatype
+
+    def chunking(self):
+        return self.get_metadata()["chunking"]
+
+    def filters(self):
+        return self.get_file_variable(0).filters()
+
+    def get_var_chunk_cache(self):
+        return self.chunk_cache if self.chunk_cache is not None else self.get_file_variable(0).get_var_chunk_cache()
+
+    def set_var_chunk_cache(self, size=None, nelems=None, preemption=None):
+        self.chunk_cache = (size, nelems, preemption)
+
+    def ncattrs(self):
+        return self.get_file_variable(0).ncattrs()
+
+    def getncattr(self, name):
+        return self.get_file_variable(0).getncattr(name)
+
+    def set_auto_maskandscale(self, is_masking_and_scaling):
+        self.mask = self.scale = is_masking_and_scaling
+
+    def set_auto_mask(self, is_masking):
+        self.mask = is_masking
+
+    def set_auto_scale(self, is_scaling):
+        self.scale = is_scaling
+
+    def get_file_variable(self, file_number):
+        """
+        :param file_number: the index of the file in the dataset's paths
+        :return: the variable object in that file, with this variable's masking, scaling and chunk cache state
+        """
+        variable = self.dataset.get_file(file_number)[self.name]
+        variable.set_auto_mask(self.mask)
+        variable.set_auto_scale(self.scale)
+        if self.chunk_cache is not None and variable.chunking() != 'contiguous' and \
+                variable.get_var_chunk_cache() != self.chunk_cache:
+            variable.set_var_chunk_cache(*self.chunk_cache)
+        return variable
+
+    def __getitem__(self, index):
+        """
+        :param index: an index of the variable, the aggregation dimension can be indexed by an int or a slice
+        :return: the values of the index, read only from the files that hold them
+        """
+        if self.dataset.aggregation_dimension not in self.dimensions:
+            return self.get_file_variable(0)[index]
+
+        # completing the index to an index for every dimension
+        index = list(index) if isinstance(index, tuple) else [index]
+        index += [slice(None)] * (self.ndim - len(index))
+        aggregation_axis = self.dimensions.index(self.dataset.aggregation_dimension)
+        aggregation_index = index[aggregation_axis]
+
+        # an int index is in one file
+        if isinstance(aggregation_index, (int, np.integer)):
+            if aggregation_index < 0:
+                aggregation_index += self.shape[aggregation_axis]
+            file_number, index[aggregation_axis] = self.dataset.find_file(int(aggregation_index))
+            return self.get_file_variable(file_number)[tuple(index)]
+        if not isinstance(aggregation_index, slice):
+            raise Exception("the aggregation dimension can be indexed only by an int or a slice")
+
+        # splitting a slice to a local slice in every file that holds part of it, with a positive step
+        global_indexes = np.arange(self.shape[aggregation_axis])[aggregation_index]
+        is_reversed = aggregation_index.step is not None and aggregation_index.step < 0
+        if is_reversed:
+            global_indexes = global_indexes[::-1]
+        step = abs(aggregation_index.step or 1)
+        file_offsets = self.dataset.get_file_offsets()
+        parts = []
+        for file_number in range(len(self.dataset.paths)):
+            local_indexes = global_indexes[(global_indexes >= file_offsets[file_number]) &
+                                           (global_indexes < file_offsets[file_number + 1])]
+            if len(local_indexes) == 0:
+                continue
+            local_indexes = local_indexes - file_offsets[file_number]
+            index[aggregation_axis] = slice(int(local_indexes[0]), int(local_indexes[-1]) + 1, step)
+            parts.append(self.get_file_variable(file_number)[tuple(index)])
+
+        # the position of the aggregation axis in the values, after int indexes removed their dimensions
+        values_axis = sum(1 for dim_index in index[:aggregation_axis] if not isinstance(dim_index, (int, np.integer)))
+        if not parts:
+            index[aggregation_axis] = slice(0, 0)
+            return self.get_file_variable(0)[tuple(index)]
+        values = np.ma.concatenate(parts, axis=values_axis) if np.ma.isMaskedArray(parts[0]) else \
+            np.concatenate(parts, axis=values_axis)
+        if is_reversed:
+            values = np.flip(values, axis=values_axis)
+        return values
+
+
 def get_time_vector_size(netcdf_file, commands_list):
     """
     :param netcdf_file: the netCDF file
@@ -37,8 +340,8 @@ def get_time_vector_size(netcdf_file, commands_list):
 
     about: finding the time vector size
     """
-    netcdf_info = list(netcdf_file.variables.values())
-    return netcdf_info[commands_list.time].size
+    variables_metadata = list(get_metadata_index(netcdf_file)["variables"].values())
+    return variables_metadata[commands_list.time]["size"]
 
 
 def get_depth_vector_size(netcdf_file, commands_list):
@@ -49,8 +352,8 @@ def get_depth_vector_size(netcdf_file, commands_list):
 
     about: finding the time vector size
     """
-    netcdf_info = list(netcdf_file.variables.values())
-    return netcdf_info[commands_list.depth].size
+    variables_metadata = list(get_metadata_index(netcdf_file)["variables"].values())
+    return variables_metadata[commands_list.depth]["size"]
 
 
 def show_info(path_to_file, show_specific_label=False, show_var_object=False, show_name=False, show_shape=False,
@@ -143,16 +446,17 @@ def variable_name_list(netcdf_file, label: Labels):
 
     info_list = []
     variable_list = []
+    metadata_index = get_metadata_index(netcdf_file)
 
     if label == Labels.LABELS or label == Labels.DATA:
-        for var in netcdf_file.variables.values():
-            variable_list.append(var.name)
+        for var_name in metadata_index["variables"]:
+            variable_list.append(var_name)
         if label == Labels.LABELS:
             info_list = variable_list
     dimension_list = []
     if label == Labels.DIMENSIONS or label == Labels.DATA:
-        for dim in netcdf_file.dimensions.values():
-            dimension_list.append(dim.name)
+        for dim_name in metadata_index["dimensions"]:
+            dimension_list.append(dim_name)
         if label == Labels.DIMENSIONS:
             info_list = dimension_list
     data_variables_list = []
@@ -207,10 +511,11 @@ def get_all_values(netcdf_file):
     return all_values_list
 
 
-def get_values(netcdf_file, field_name):
+def get_values(netcdf_file, field_name, dtype=None):
     """
     :param netcdf_file: the netCDF file
     :param field_name: the name of the variables.values object in the netCDF
+    :param dtype: the floating point type of the values. defaults to values_dtype
     :return: an array that contains all the fields numerical values
 
     about: getting from the netCDF variables.values object an array of the numerical values
@@ -224,10 +529,578 @@ def get_values(netcdf_file, field_name):
     [... ... ...]]
 
     """
-    values = np.ma.filled(netcdf_file[field_name][:].astype(float), np.nan)
+    values = read_values(netcdf_file[field_name], slice(None), dtype, "scan")
+    return values
+
+
+def get_slab_values(netcdf_file, field_name, field_indexes, time_value=0, depth_value=0, lat_slice=slice(None),
+                    lon_slice=slice(None), dtype=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the variables.values object in the netCDF
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :param time_value: the index in the time dimension of the wanted slab
+    :param depth_value: the index in the depth dimension of the wanted slab
+    :param lat_slice: the part of the latitude dimension to read (all of it by default)
+    :param lon_slice: the part of the longitude dimension to read (all of it by default)
+    :param dtype: the floating point type of the values. defaults to values_dtype
+    :return: a 2D array of the field's numerical values, in order: lat, lon
+
+    about: getting only one lat-lon slab of a variable from the netCDF, instead of reading all of its values. Only the
+    slab is read from the file, so the memory used does not depend on the time and depth sizes.
+
+    call_example:
+    get_slab_values(netcdf_file, 'msl', field_indexes, time_value=5)
+    gets an array with the sea level pressure of the 6th time value, depends on lat and lon
+    """
+    # taking the slab from the slice cache when it is used. the memory mapped file is shared by every read of the
+    # field, so the slab is copied out of it, as the callers may change the values they get in place
+    if is_using_slice_cache and (dtype is None or dtype == values_dtype):
+        slice_cache = get_slice_cache(netcdf_file, field_name, field_indexes)
+        if slice_cache is not None:
+            return np.array(slice_cache[time_value if field_indexes.time is not None else 0,
+                                        depth_value if field_indexes.depth is not None else 0, lat_slice, lon_slice])
+
+    slab_index = make_slab_index(netcdf_file[field_name].ndim, field_indexes, time_value, depth_value, lat_slice,
+                                 lon_slice)
+    values = read_values(netcdf_file[field_name], slab_index, dtype, "map")
+
+    # the slab keeps the order of lat and lon as they are in the file, so flipping it to lat, lon if needed
+    if field_indexes.lat > field_indexes.lon:
+        values = values.transpose()
     return values
 
 
+def get_domain_values(netcdf_file, field_name, field_indexes, map_domain, time_value=0, depth_value=0, dtype=None,
+                      is_direction=False):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the variables.values object in the netCDF
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :param map_domain: a MapDomain object of the part of the grid to read and its level of detail
+    :param time_value: the index in the time dimension of the wanted slab
+    :param depth_value: the index in the depth dimension of the wanted slab
+    :param dtype: the floating point type of the values. defaults to values_dtype
+    :param is_direction: if the field is a direction in degrees, like the angle of a polar vector
+    :return: a 2D array of the field's values in the map domain, in order: lat, lon
+
+    about: reading the lat-lon slab of the map domain, a slab for every part of the longitude, and averaging it to the
+    map domain's level of detail. Only the map domain is read from the file, so a regional map of a global file reads
+    only the region. Directions are averaged as unit vectors, by their sine and cosine, as the average of the numbers
+    350 and 10 is 180, the opposite direction of both.
+    """
+    values = np.concatenate([get_slab_values(netcdf_file, field_name, field_indexes, time_value, depth_value,
+                                             map_domain.lat_slice, lon_slice, dtype)
+                             for lon_slice in map_domain.lon_slices], axis=1)
+    if is_direction and (map_domain.lat_block > 1 or map_domain.lon_block > 1):
+        radians = np.deg2rad(values)
+        return np.rad2deg(np.arctan2(block_average(np.sin(radians), map_domain.lat_block, map_domain.lon_block),
+                                     block_average(np.cos(radians), map_domain.lat_block, map_domain.lon_block)))
+    return block_average(values, map_domain.lat_block, map_domain.lon_block)
+
+
+def get_domain_coordinates(netcdf_file, lat_name, lon_name, map_domain):
+    """
+    :param netcdf_file: the netCDF file
+    :param lat_name: the name of the latitude vector in the netCDF
+    :param lon_name: the name of the longitude vector in the netCDF
+    :param map_domain: a MapDomain object of the part of the grid to read and its level of detail
+    :return: the latitude and longitude vectors of the map domain, in full precision. The longitude of a domain that
+    crosses the end of the longitude vector continues over 360 degrees, so it stays ascending.
+    """
+    lat = read_values(netcdf_file[lat_name], map_domain.lat_slice, np.float64)
+    lon = np.concatenate([read_values(netcdf_file[lon_name], lon_slice, np.float64)
+                          for lon_slice in map_domain.lon_slices])
+    if len(map_domain.lon_slices) > 1:
+        lon = np.unwrap(lon, period=360)
+    return block_average(lat[:, np.newaxis], map_domain.lat_block, 1)[:, 0], \
+        block_average(lon[np.newaxis, :], 1, map_domain.lon_block)[0]
+
+
+def find_index_range(coordinate, lower_value, upper_value):
+    """
+    :param coordinate: a monotonic coordinate vector, ascending or descending
+    :param lower_value: the lower edge of the range
+    :param upper_value: the upper edge of the range
+    :return: a slice of the indexes of the coordinate between the edges, and one more index on every side, so the
+    values cover the edges
+
+    about: finding the indexes by binary search, so only the coordinate vector is searched and not the field
+
+    call_example:
+    find_index_range(np.array([90, 60, 30, 0, -30]), 10, 50)
+    -> slice(1, 4)
+    """
+    is_descending = len(coordinate) > 1 and coordinate[0] > coordinate[-1]
+    ascending_coordinate = coordinate[::-1] if is_descending else coordinate
+    start = max(0, int(np.searchsorted(ascending_coordinate, lower_value, side='left')) - 1)
+    stop = min(len(coordinate), int(np.searchsorted(ascending_coordinate, upper_value, side='right')) + 1)
+    if start >= stop:
+        raise Exception("no grid points between " + str(lower_value) + " and " + str(upper_value))
+    if is_descending:
+        start, stop = len(coordinate) - stop, len(coordinate) - start
+    return slice(start, stop)
+
+
+def find_lon_index_ranges(lon, lon_min, lon_max):
+    """
+    :param lon: an ascending longitude vector, in degrees
+    :param lon_min: the western edge of the range
+    :param lon_max: the eastern edge of the range
+    :return: a list of slices of the indexes of the range, and the edges moved to the degrees of lon, so
+    lon_min <= lon_max. A range that crosses the end of a global longitude vector is two slices, the end of the vector
+    and its start.
+
+    call_example:
+    find_lon_index_ranges(np.arange(0, 360, 1.0), -20, 30)
+    -> [slice(339, 360), slice(0, 32)], 340, 390
+    """
+    # moving the edges to the degrees of the longitude vector
+    lon_min = lon[0] + (lon_min - lon[0]) % 360
+    lon_max = lon_min + (lon_max - lon_min) % 360
+    if lon_max == lon_min:
+        lon_max += 360
+
+    # a range inside the vector
+    if lon_max <= lon[-1] or len(lon) < 2:
+        return [find_index_range(lon, lon_min, lon_max)], lon_min, lon_max
+
+    # a range that crosses the end of the vector. only a global vector continues from its start, and the range of a
+    # regional vector is cut to the part over the vector. a western edge west of the vector was moved past its end, so
+    # it is moved back
+    is_global = lon[-1] - lon[0] + (lon[1] - lon[0]) >= 360 - 1e-6
+    if not is_global:
+        if lon_min > lon[-1]:
+            lon_min, lon_max = lon_min - 360, lon_max - 360
+        lon_min, lon_max = max(lon_min, lon[0]), min(lon_max, lon[-1])
+        if lon_min >= lon_max:
+            raise Exception("the map corners are out of the longitude range of the grid")
+        return [find_index_range(lon, lon_min, lon_max)], lon_min, lon_max
+    eastern_part = find_index_range(lon, lon_min, lon[-1])
+    western_part = find_index_range(lon, lon[0], lon_max - 360)
+    return [slice(eastern_part.start, len(lon)), slice(0, western_part.stop)], lon_min, lon_max
+
+
+def block_average(values, lat_block, lon_block):
+    """
+    :param values: a 2D array of values, in order: lat, lon
+    :param lat_block: the number of values along the latitude that are averaged together
+    :param lon_block: the number of values along the longitude that are averaged together
+    :return: a 2D array of the averages of the blocks. missing values are left out of the averages, and a block of only
+    missing values is missing
+
+    call_example:
+    block_average(np.array([[1, 2, 3], [3, np.nan, 5]]), 2, 2)
+    -> [[2, 4]]
+    """
+    if lat_block == 1 and lon_block == 1:
+        return values
+
+    # filling the edges with missing values, so the blocks cover the whole array
+    lat_size = -(-values.shape[0] // lat_block) * lat_block
+    lon_size = -(-values.shape[1] // lon_block) * lon_block
+    if (lat_size, lon_size) != values.shape:
+        values = np.pad(values, ((0, lat_size - values.shape[0]), (0, lon_size - values.shape[1])),
+                        constant_values=np.nan)
+
+    blocks = values.reshape(lat_size // lat_block, lat_block, lon_size // lon_block, lon_block)
+    is_valid = ~np.isnan(blocks)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.where(is_valid, blocks, 0).sum(axis=(1, 3)) / is_valid.sum(axis=(1, 3))).astype(values.dtype,
+                                                                                                  copy=False)
+
+
+@Instrumentation.timed_stage
+def read_values(variable, index, dtype=None, access_pattern=None):
+    """
+    :param variable: the variable object in the netCDF
+    :param index: the index of the values to read, any index the variable object accepts
+    :param dtype: the floating point type of the values. defaults to values_dtype
+    :param access_pattern: "map" for lat-lon slabs, "series" for lines along one dimension, "scan" for reading a
+    variable through, or None to leave the variable's chunk cache as it is
+    :return: an array of the values, unpacked, with NaN in place of missing values
+
+    about: reading values from the netCDF without netCDF4's masking and scaling, which returns a masked float64 array
+    for packed int16 variables. The raw values are converted once to dtype, missing values are set to NaN in place, and
+    scale_factor and add_offset are applied in place in dtype.
+    """
+    # the scalar type of dtype, so dtype can be given as np.float32, np.dtype('float32') or 'float32'
+    dtype = np.dtype(values_dtype if dtype is None else dtype).type
+    if access_pattern is not None:
+        set_chunk_cache(variable, index, access_pattern)
+    read_start = time.perf_counter()
+
+    # reading the raw values, and returning the variable to its masking and scaling state
+    is_masking, is_scaling = variable.mask, variable.scale
+    variable.set_auto_maskandscale(False)
+    try:
+        raw_values = np.asarray(variable[index])
+    finally:
+        variable.set_auto_mask(is_masking)
+        variable.set_auto_scale(is_scaling)
+
+    Instrumentation.add_bytes_read(raw_values.nbytes)
+    if is_timing_reads:
+        read_timings.append({"variable": variable.name, "index": str(index), "access_pattern": access_pattern,
+                             "seconds": time.perf_counter() - read_start, "bytes": raw_values.nbytes,
+                             "chunks": count_index_chunks(variable, index)[0]})
+
+    # converting to dtype. a float variable already in dtype is not copied
+    values = raw_values.astype(dtype, copy=False)
+    missing_values = find_missing_values(variable, raw_values)
+    if missing_values is not None:
+        values[missing_values] = np.nan
+
+    # unpacking packed variables
+    if 'scale_factor' in variable.ncattrs():
+        values *= dtype(variable.getncattr('scale_factor'))
+    if 'add_offset' in variable.ncattrs():
+        values += dtype(variable.getncattr('add_offset'))
+    return values
+
+
+def find_missing_values(variable, raw_values):
+    """
+    :param variable: the variable object in the netCDF
+    :param raw_values: the raw values read from the variable, before unpacking
+    :return: a boolean array, True where raw_values are missing, or None if nothing is missing
+
+    about: finding the missing values the way netCDF4 masks them: values equal to _FillValue (or the default fill
+    value of the type, if there is no _FillValue) or missing_value, and values out of valid_min, valid_max and
+    valid_range.
+    """
+    attributes = variable.ncattrs()
+    missing_values = np.zeros(raw_values.shape, dtype=bool)
+
+    if '_FillValue' in attributes:
+        missing_values |= raw_values == variable.getncattr('_FillValue')
+    elif raw_values.dtype.kind in 'iuf' and raw_values.dtype.itemsize > 1:
+        missing_values |= raw_values == nc.default_fillvals[raw_values.dtype.str[1:]]
+    if 'missing_value' in attributes:
+        missing_values |= np.isin(raw_values, np.atleast_1d(variable.getncattr('missing_value')))
+    valid_min, valid_max = None, None
+    if 'valid_range' in attributes:
+        valid_min, valid_max = variable.getncattr('valid_range')
+    if 'valid_min' in attributes:
+        valid_min = variable.getncattr('valid_min')
+    if 'valid_max' in attributes:
+        valid_max = variable.getncattr('valid_max')
+    if valid_min is not None:
+        missing_values |= raw_values < valid_min
+    if valid_max is not None:
+        missing_values |= raw_values > valid_max
+
+    if not missing_values.any():
+        return None
+    return missing_values
+
+
+def get_chunk_shape(variable):
+    """
+    :param variable: the variable object in the netCDF
+    :return: a list of the chunk's length in every dimension, or None if the variable is not chunked
+    """
+    chunking = variable.chunking()
+    if chunking is None or chunking == 'contiguous':
+        return None
+    return list(chunking)
+
+
+def is_compressed(variable):
+    """
+    :param variable: the variable object in the netCDF
+    :return: True if the variable's chunks are compressed, so every chunk that is read is decompressed as a whole
+    """
+    filters = variable.filters() or {}
+    return any(filters.get(filter_name) for filter_name in ['zlib', 'szip', 'zstd', 'bzip2', 'blosc'])
+
+
+def count_index_chunks(variable, index):
+    """
+    :param variable: the variable object in the netCDF
+    :param index: an index of the variable, made of ints and slices
+    :return: the number of chunks the index reads from, and their size in bytes. a variable that is not chunked is one
+    chunk of the index's size
+
+    call_example:
+    count_index_chunks(variable, (5, slice(None), slice(None))) for a variable of shape (124, 721, 1440) with chunks of
+    (1, 361, 720)
+    -> 4, 4 * 361 * 720 * 2
+    """
+    index = list(index) if isinstance(index, tuple) else [index]
+    index += [slice(None)] * (variable.ndim - len(index))
+    chunk_shape = get_chunk_shape(variable)
+    if chunk_shape is None:
+        chunk_shape = variable.shape
+
+    chunks_number = 1
+    for dim_index, dim_size, chunk_length in zip(index, variable.shape, chunk_shape):
+        chunks_number *= count_dimension_chunks(dim_index, dim_size, chunk_length)
+    return chunks_number, chunks_number * int(np.prod(chunk_shape)) * variable.dtype.itemsize
+
+
+def count_dimension_chunks(dim_index, dim_size, chunk_length):
+    """
+    :param dim_index: the index of one dimension, an int or a slice
+    :param dim_size: the size of the dimension
+    :param chunk_length: the length of the chunks along the dimension
+    :return: the number of chunks along the dimension that the index reads from
+
+    about: counting the chunks from the first and last indexes of a slice and its step, without making the indexes.
+    When the step is shorter than a chunk, every chunk from the first index's to the last index's is read, and
+    otherwise every index is in a chunk of its own.
+
+    call_example:
+    count_dimension_chunks(slice(10, 50, 2), 100, 16)
+    -> 4
+    """
+    if not isinstance(dim_index, slice):
+        return 1
+    indexes = range(*dim_index.indices(dim_size))
+    if len(indexes) == 0:
+        return 0
+    step = abs(indexes.step)
+    if step >= chunk_length:
+        return len(indexes)
+    first_index, last_index = sorted([indexes[0], indexes[-1]])
+    return last_index // chunk_length - first_index // chunk_length + 1
+
+
+def set_chunk_cache(variable, index, access_pattern):
+    """
+    :param variable: the variable object in the netCDF
+    :param index: an index of the variable, the first of the reads of the access pattern
+    :param access_pattern: "map" for lat-lon slabs, "series" for lines along one dimension, "scan" for reading a
+    variable through
+
+    about: fitting the chunk cache of a chunked variable to the access pattern. The cache holds all the chunks of one
+    read, so the next slab, or the next line in the same chunks, is taken from the cache and not decompressed again.
+    netCDF reopens the variable when its cache is set, which empties it, so the cache is set only when it changes.
+    """
+    # chunks that are not compressed and are read once are read straight from the file, without the cache
+    if get_chunk_shape(variable) is None or (access_pattern == "scan" and not is_compressed(variable)):
+        return
+    chunks_number, chunks_bytes = count_index_chunks(variable, index)
+
+    # the cache only grows, so netCDF's default cache is kept when it is already big enough for the reads
+    current_size, current_nelems, current_preemption = variable.get_var_chunk_cache()
+    chunk_cache = (max(current_size, min(chunks_bytes, max_chunk_cache_bytes)), max(current_nelems, 10 * chunks_number),
+                   access_pattern_preemptions[access_pattern])
+    if chunk_cache[:2] == (current_size, current_nelems) and abs(current_preemption - chunk_cache[2]) < 1e-6:
+        return
+    variable.set_var_chunk_cache(*chunk_cache)
+
+
+def plan_chunk_aligned_slices(variable, axis, wanted_length):
+    """
+    :param variable: the variable object in the netCDF
+    :param axis: the index of the dimension the variable is read along
+    :param wanted_length: about how many values of the dimension to read at once
+    :return: a list of slices that cover the dimension, every one starts at a chunk boundary
+
+    about: planning reads along a dimension so that a chunk is never split between two reads. The length of a read is
+    rounded down to whole chunks, and is at least one chunk, so every chunk is decompressed once.
+
+    call_example:
+    plan_chunk_aligned_slices(variable, 0, 100) for a dimension of size 250 with chunks of 24
+    -> [slice(0, 96), slice(96, 192), slice(192, 250)]
+    """
+    dim_size = variable.shape[axis]
+    chunk_shape = get_chunk_shape(variable)
+    chunk_length = chunk_shape[axis] if chunk_shape is not None else 1
+    read_length = max(chunk_length, wanted_length // chunk_length * chunk_length)
+    return [slice(read_start, min(read_start + read_length, dim_size)) for read_start in range(0, dim_size, read_length)]
+
+
+def summarize_read_timings():
+    """
+    :return: a dictionary of the number of reads, their total seconds, bytes and chunks, by variable and access pattern
+
+    call_example:
+    summarize_read_timings()
+    -> {'msl map': {'reads': 124, 'seconds': 0.41, 'bytes': 257558400, 'chunks': 496}}
+    """
+    summary = {}
+    for read_timing in read_timings:
+        read_summary = summary.setdefault(read_timing["variable"] + " " + str(read_timing["access_pattern"]),
+                                          {"reads": 0, "seconds": 0.0, "bytes": 0, "chunks": 0})
+        read_summary["reads"] += 1
+        for key in ["seconds", "bytes", "chunks"]:
+            read_summary[key] += read_timing[key]
+    return summary
+
+
+@Instrumentation.timed_stage
+def get_slice_cache(netcdf_file, field_name, field_indexes):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the variables.values object in the netCDF
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :return: a memory mapped array of the field, in order: time, depth, lat, lon, or None if it does not fit in the
+    slice cache
+
+    about: getting the field's file in the slice cache, or saving the field to it the first time. The file's name has
+    the path, modification time and size of the netCDF file, so when the netCDF file changes its old files are
+    deleted and it is saved again. The file is memory mapped read only, so reading a slab reads only its pages
+    from the disk, and the array can't be changed.
+    """
+    file_name, file_prefix = get_slice_cache_file_name(netcdf_file, field_name, field_indexes)
+    if file_name in slice_caches:
+        return slice_caches[file_name]
+
+    if not os.path.exists(file_name):
+        shape = get_slice_cache_shape(netcdf_file, field_name, field_indexes)
+        cache_bytes = int(np.prod(shape)) * np.dtype(values_dtype).itemsize
+        if cache_bytes > max_slice_cache_bytes:
+            return None
+        # deleting the files of older versions of the netCDF file, and the least recently used files. a file that
+        # another process has open can't be deleted on windows, and is left for a later run
+        for old_file_name in glob.glob(glob.escape(file_prefix) + "*.npy"):
+            try:
+                os.remove(old_file_name)
+            except OSError:
+                pass
+        evict_slice_cache(cache_bytes)
+        write_slice_cache(netcdf_file, field_name, field_indexes, file_name, shape)
+    else:
+        # the modification time of a file is the last time it was used, for evict_slice_cache()
+        os.utime(file_name)
+    slice_caches[file_name] = np.load(file_name, mmap_mode='r')
+    return slice_caches[file_name]
+
+
+def get_slice_cache_file_name(netcdf_file, field_name, field_indexes):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the variables.values object in the netCDF
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :return: the name of the field's file in the slice cache, and the beginning of the name that is the same for all
+    the versions of the netCDF file
+
+    call_example:
+    get_slice_cache_file_name(netcdf_file, 'msl', field_indexes)
+    -> ('~/.nom_cache/slices/6b1f..._msl_0c93....npy', '~/.nom_cache/slices/6b1f..._msl_')
+    """
+    paths = netcdf_file.paths if isinstance(netcdf_file, AggregatedDataset) else [netcdf_file.filepath()]
+    paths = [os.path.abspath(path) for path in paths]
+    file_keys = [[os.stat(path).st_mtime, os.stat(path).st_size] for path in paths]
+    version_key = json.dumps([file_keys, np.dtype(values_dtype).str, [field_indexes.time, field_indexes.depth,
+                                                                      field_indexes.lat, field_indexes.lon]])
+    file_prefix = os.path.join(slice_cache_directory, hashlib.sha1(json.dumps(paths).encode()).hexdigest() + "_" +
+                               field_name + "_")
+    return file_prefix + hashlib.sha1(version_key.encode()).hexdigest() + ".npy", file_prefix
+
+
+def get_slice_cache_shape(netcdf_file, field_name, field_indexes):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the variables.values object in the netCDF
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :return: the shape of the field in order: time, depth, lat, lon. a field without time or depth has a 1 sized
+    time or depth dimension, like in omnom.arrange_fields()
+    """
+    field_shape = get_metadata_index(netcdf_file)["variables"][field_name]["shape"]
+    return tuple(field_shape[field_index] if field_index is not None else 1 for field_index in
+                 [field_indexes.time, field_indexes.depth, field_indexes.lat, field_indexes.lon])
+
+
+@Instrumentation.timed_stage
+def write_slice_cache(netcdf_file, field_name, field_indexes, file_name, shape):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the variables.values object in the netCDF
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :param file_name: the name of the field's file in the slice cache
+    :param shape: the shape of the field in order: time, depth, lat, lon
+
+    about: saving the field to an uncompressed .npy file in time, depth, lat, lon order. The field is read in ranges of
+    time values that start at chunk boundaries, of about slice_cache_write_bytes, and every range is written to the
+    memory mapped file and dropped, so the memory does not depend on the size of the field. The file is written to a
+    temporary file that is then renamed, so other runs never read half of it.
+    """
+    variable = netcdf_file[field_name]
+    os.makedirs(slice_cache_directory, exist_ok=True)
+    temporary_file_name = file_name + "." + str(os.getpid()) + ".tmp"
+    slice_cache = np.lib.format.open_memmap(temporary_file_name, mode="w+", dtype=values_dtype, shape=shape)
+
+    # the dimensions of the values read, in the order of the variable, and their order in the slice cache
+    present_axes = [axis for axis, field_index in enumerate([field_indexes.time, field_indexes.depth,
+                                                             field_indexes.lat, field_indexes.lon])
+                    if field_index is not None]
+    field_order = sorted(present_axes, key=lambda axis: [field_indexes.time, field_indexes.depth, field_indexes.lat,
+                                                         field_indexes.lon][axis])
+    time_step_bytes = int(np.prod(shape[1:])) * np.dtype(values_dtype).itemsize
+    if field_indexes.time is not None:
+        time_slices = plan_chunk_aligned_slices(variable, field_indexes.time,
+                                                max(1, slice_cache_write_bytes // time_step_bytes))
+    else:
+        time_slices = [slice(0, 1)]
+
+    for time_slice in time_slices:
+        index = make_slab_index(variable.ndim, field_indexes, time_slice, slice(None))
+        values = read_values(variable, index, values_dtype, "scan")
+        # ordering the values' dimensions like the slice cache, and adding the missing time and depth dimensions
+        values = values.transpose([field_order.index(axis) for axis in present_axes])
+        values = values.reshape((time_slice.stop - time_slice.start,) + shape[1:])
+        slice_cache[time_slice] = values
+    slice_cache.flush()
+    del slice_cache
+    os.replace(temporary_file_name, file_name)
+
+
+def evict_slice_cache(needed_bytes):
+    """
+    :param needed_bytes: the size of the file that is about to be saved to the slice cache
+
+    about: deleting the least recently used files of the slice cache, until there is room for needed_bytes in
+    max_slice_cache_bytes
+    """
+    cache_files = [os.path.join(slice_cache_directory, file_name) for file_name in os.listdir(slice_cache_directory)
+                   if file_name.endswith(".npy")] if os.path.isdir(slice_cache_directory) else []
+    cache_files.sort(key=os.path.getmtime)
+    cache_bytes = sum(os.path.getsize(cache_file) for cache_file in cache_files)
+    for cache_file in cache_files:
+        if cache_bytes + needed_bytes <= max_slice_cache_bytes:
+            break
+        try:
+            cache_file_bytes = os.path.getsize(cache_file)
+            os.remove(cache_file)
+        except OSError:
+            continue
+        cache_bytes -= cache_file_bytes
+        slice_caches.pop(cache_file, None)
+
+
+def make_slab_index(ndim, field_indexes, time_value=0, depth_value=0, lat_slice=slice(None),
+                    lon_slice=slice(None)):
+    """
+    :param ndim: the number of dimensions of the variable
+    :param field_indexes: a FieldIndexes object with the variable's index for every dimension
+    :param time_value: the index in the time dimension of the wanted slab
+    :param depth_value: the index in the depth dimension of the wanted slab
+    :param lat_slice: the part of the latitude dimension to read
+    :param lon_slice: the part of the longitude dimension to read
+    :return: a tuple that can index the variable object in the netCDF
+
+    about: building the per-dimension index of a lat-lon slab. Dimensions that are not time, depth, lat or lon are
+    taken at their first index.
+
+    call_example:
+    make_slab_index(3, field_indexes, time_value=5)
+    for a variable with dimensions [time, lat, lon] it returns: (5, slice(None), slice(None))
+    """
+    slab_index = [0] * ndim
+    if field_indexes.time is not None:
+        slab_index[field_indexes.time] = time_value
+    if field_indexes.depth is not None:
+        slab_index[field_indexes.depth] = depth_value
+    if field_indexes.lat is not None:
+        slab_index[field_indexes.lat] = lat_slice
+    if field_indexes.lon is not None:
+        slab_index[field_indexes.lon] = lon_slice
+    return tuple(slab_index)
+
+
 def dimensions_of_variable_list(netcdf_file, field_name):
     """
     :param netcdf_file: the netCDF file
@@ -241,11 +1114,135 @@ def dimensions_of_variable_list(netcdf_file, field_name):
     it returns: [time, lat, lon]
     """
     dimensions = []
-    for dim in netcdf_file.variables[field_name].get_dims():
-        dimensions.append(dim.name)
+    for dim_name in get_metadata_index(netcdf_file)["variables"][field_name]["dimensions"]:
+        dimensions.append(dim_name)
     return dimensions
 
 
+def get_metadata_index(netcdf_file):
+    """
+    :param netcdf_file: the netCDF file, or the path to it as a string
+    :return: the metadata index of the netCDF file, a dictionary
+
+    about: getting the metadata index of a netCDF file: its dimensions and sizes, and for every variable its dimensions,
+    shape, size, data type, chunking, and the minimum and maximum of coordinate variables. The index is built once and
+    saved in the running process and in a sidecar file next to the netCDF file (or in metadata_cache_directory), with
+    the path, modification time and size of the netCDF file. It is used as long as they did not change, so the schema
+    of the file is not walked again in the next runs. When a path is given and the index is up to date, the netCDF file
+    is not opened at all.
+
+    call_example:
+    get_metadata_index(netcdf_file)["variables"]["msl"]["dimensions"]
+    -> ['time', 'latitude', 'longitude']
+    """
+    if isinstance(netcdf_file, AggregatedDataset):
+        return netcdf_file.get_metadata_index()
+    path_to_file = netcdf_file if isinstance(netcdf_file, str) else netcdf_file.filepath()
+    file_stat = os.stat(path_to_file)
+    file_key = [os.path.abspath(path_to_file), file_stat.st_mtime, file_stat.st_size]
+
+    # looking for an up to date index in the running process, then in the sidecar files
+    if path_to_file in metadata_indexes and metadata_indexes[path_to_file]["file_key"] == file_key:
+        return metadata_indexes[path_to_file]
+    for index_file_name in get_metadata_index_file_names(path_to_file):
+        try:
+            with open(index_file_name) as f:
+                metadata_index = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if metadata_index.get("file_key") == file_key:
+            metadata_indexes[path_to_file] = metadata_index
+            return metadata_index
+
+    # building the index from the netCDF file, and saving it to the first sidecar file that can be written
+    if isinstance(netcdf_file, str):
+        with nc.Dataset(path_to_file) as opened_netcdf_file:
+            metadata_index = build_metadata_index(opened_netcdf_file)
+    else:
+        metadata_index = build_metadata_index(netcdf_file)
+    metadata_index["file_key"] = file_key
+    metadata_indexes[path_to_file] = metadata_index
+    for index_file_name in get_metadata_index_file_names(path_to_file):
+        try:
+            os.makedirs(os.path.dirname(index_file_name) or ".", exist_ok=True)
+            temporary_file_name = index_file_name + "." + str(os.getpid()) + ".tmp"
+            with open(temporary_file_name, "w") as f:
+                json.dump(metadata_index, f)
+            os.replace(temporary_file_name, index_file_name)
+            break
+        except OSError:
+            continue
+    return metadata_index
+
+
+def get_metadata_index_file_names(path_to_file):
+    """
+    :param path_to_file: the path for the netCDF file as a string
+    :return: a list of the possible file names of the netCDF file's metadata index, by order of preference
+
+    about: the metadata index is saved next to the netCDF file, and if it can't be written there, in
+    metadata_cache_directory under a name made from the netCDF file's full path.
+    """
+    index_file_names = [path_to_file + ".nomindex.json"]
+    if metadata_cache_directory is not None:
+        path_hash = hashlib.sha1(os.path.abspath(path_to_file).encode()).hexdigest()
+        index_file_names.append(os.path.join(metadata_cache_directory, path_hash + ".nomindex.json"))
+    return index_file_names
+
+
+@Instrumentation.timed_stage
+def build_metadata_index(netcdf_file):
+    """
+    :param netcdf_file: the netCDF file
+    :return: the metadata index of the netCDF file, a dictionary
+
+    about: walking the dimensions and variables of the netCDF file to build its metadata index. see get_metadata_index
+    """
+    metadata_index = {"dimensions": {}, "variables": {}}
+    for dim in netcdf_file.dimensions.values():
+        metadata_index["dimensions"][dim.name] = {"size": dim.size, "is_unlimited": dim.isunlimited()}
+    for var in netcdf_file.variables.values():
+        var_metadata = {"dimensions": list(var.dimensions), "shape": list(var.shape), "size": int(var.size),
+                        "dtype": str(var.dtype), "chunking": var.chunking()}
+
+        # coordinate variables are one dimensional variables with the name of their dimension
+        if var.dimensions == (var.name,) and var.size > 0 and var.dtype.kind in "iuf":
+            coordinate_values = get_values(netcdf_file, var.name, np.float64)
+            var_metadata["min"] = float(np.nanmin(coordinate_values))
+            var_metadata["max"] = float(np.nanmax(coordinate_values))
+        metadata_index["variables"][var.name] = var_metadata
+    return metadata_index
+
+
+# a class of the part of the lat-lon grid a map shows, and the level of detail it is read in. The latitude is read with
+# lat_slice, the longitude with every one of lon_slices, one after the other, and every block of lat_block x lon_block
+# read values is averaged into one cell of the map.
+class MapDomain:
+    lat_slice: slice
+    lon_slices: List[slice]
+    lat_block: int
+    lon_block: int
+
+    def __init__(self, lat_slice=slice(None), lon_slices=None, lat_block=1, lon_block=1):
+        self.lat_slice = lat_slice
+        self.lon_slices = lon_slices if lon_slices is not None else [slice(None)]
+        self.lat_block = lat_block
+        self.lon_block = lon_block
+
+    def is_whole_grid(self):
+        """
+        :return: True if the map domain is the whole grid in full resolution
+        """
+        return self.lat_slice == slice(None) and self.lon_slices == [slice(None)] and self.lat_block == 1 and \
+            self.lon_block == 1
+
+    def get_reduction(self):
+        """
+        :return: the number of grid points along the latitude and along the longitude in one cell of the map
+        """
+        return (self.lat_slice.step or 1) * self.lat_block, (self.lon_slices[0].step or 1) * self.lon_block
+
+
 # a class that saves to an object the dimention's indexes of a specific variable object in the netCDF
 class FieldIndexes:
     time: Optional[int]
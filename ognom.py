@@ -1,8 +1,494 @@
 """
 welcome to 'ognom graphing with Netcdf for Oceanography & Meteorology ' library.
+This module contains functions about graph building.
+
+algorithm: Graph making starts with make_graph_2d(). One of the x and y axes of the graph is a coordinate (time, depth,
+lat or lon) that the graph's lines go along, and the other is the data field. find_field_and_line_labels() finds which
+is which. Then a line is drawn for every combination of the time, depth, lat and lon indexes in commands_list, except
+for the coordinate the lines go along: a time series at a point, a vertical profile, or a zonal or meridional transect.
+get_lines_values() reads all the lines in one pass along the coordinate, in chunks of line_chunk_size values, and only
+the values of the lines are read from the netCDF file, never the whole field.
+Accumulating graphs reduce a region to its statistics along the time: the area mean with min-max and percentiles
+envelopes (get_area_statistics()), and the monthly climatology of the area mean (get_monthly_climatology()). The region
+is read in chunks along the time by read_time_chunks(), and the chunks are merged into running statistics
+(RunningStatistics), so the memory the reductions use does not grow with the length of the record.
 """
+import itertools
+import numpy as np
+import netCDF4 as nc
+import netCDF_file_handler as nfh
+import Instrumentation
 from InputManager import GraphCommandsList
 
+# the number of values read from the netCDF file at once, along the coordinate the lines go along
+line_chunk_size = 4096
+
+# the maximum size in bytes of a chunk of values the reductions read from the netCDF file at once
+reduction_chunk_bytes = 64 * 2 ** 20
+
+# the percentiles of the region's values that are drawn as an envelope around the area mean
+envelope_percentiles = (10, 90)
+
+
+@Instrumentation.timed_stage
+def make_graph_2d(netcdf_file, commands_list: GraphCommandsList, ax=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param ax: the matplotlib axes the graph is drawn on. defaults to pyplot's current axes
+
+    about: this function draws a line of the data field along a coordinate, for every point, time and depth in
+    commands_list
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+
+    # finding the data field and the coordinate the lines go along
+    field_label, line_label = find_field_and_line_labels(netcdf_file, commands_list)
+    field_name = commands_list.info_list[field_label]
+    field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, field_name, commands_list)
+    line_dimension = find_line_dimension(commands_list, line_label)
+    line_coordinate = get_coordinate_values(netcdf_file, commands_list.info_list[line_label])
+
+    is_field_on_x = field_label == commands_list.x_axis
+    axes_names = {field_label: field_name, line_label: commands_list.info_list[line_label]}
+
+    if commands_list.reduction:
+        # reducing the points' region to its statistics along the time
+        if line_dimension != 'time':
+            raise Exception("area means and climatologies are graphs along the time")
+        lat_slice, lon_slice = get_region_slices(commands_list)
+        if commands_list.reduction == 1:
+            draw_area_statistics(ax, line_coordinate, get_area_statistics(netcdf_file, commands_list, field_name,
+                                                                          lat_slice, lon_slice), is_field_on_x)
+        else:
+            draw_monthly_climatology(ax, get_monthly_climatology(netcdf_file, commands_list, field_name, lat_slice,
+                                                                 lon_slice), is_field_on_x)
+            axes_names[line_label] = "month"
+    else:
+        # reading all the lines, and drawing them
+        lines_points = get_lines_points(commands_list, line_dimension)
+        lines_values = get_lines_values(netcdf_file, field_name, field_indexes, line_dimension, lines_points)
+        for line_point, line_values in zip(lines_points, lines_values):
+            line_name = make_line_name(netcdf_file, commands_list, line_point)
+            draw_line(ax, line_coordinate, line_values, is_field_on_x, label=line_name)
+
+    # dates are long, so they are rotated to not overlap
+    if not is_field_on_x and line_dimension == 'time' and commands_list.reduction != 2:
+        ax.figure.autofmt_xdate()
+    ax.set_xlabel(axes_names[commands_list.x_axis])
+    ax.set_ylabel(axes_names[commands_list.y_axis])
+    if len(ax.get_legend_handles_labels()[0]) > 1:
+        ax.legend()
+
+
+def draw_line(ax, coordinate, values, is_field_on_x, **kwargs):
+    """
+    :param ax: the matplotlib axes the line is drawn on
+    :param coordinate: the values of the coordinate the line goes along
+    :param values: the values of the data field
+    :param is_field_on_x: is the data field on the x axis
+    :param kwargs: more arguments to ax.plot
+    """
+    if is_field_on_x:
+        ax.plot(values, coordinate, **kwargs)
+    else:
+        ax.plot(coordinate, values, **kwargs)
+
+
+def draw_envelope(ax, coordinate, lower_values, upper_values, is_field_on_x, **kwargs):
+    """
+    :param ax: the matplotlib axes the envelope is drawn on
+    :param coordinate: the values of the coordinate the envelope goes along
+    :param lower_values: the lower edge of the envelope
+    :param upper_values: the upper edge of the envelope
+    :param is_field_on_x: is the data field on the x axis
+    :param kwargs: more arguments to ax.fill_between
+    """
+    if is_field_on_x:
+        ax.fill_betweenx(coordinate, lower_values, upper_values, **kwargs)
+    else:
+        ax.fill_between(coordinate, lower_values, upper_values, **kwargs)
+
+
+def find_field_and_line_labels(netcdf_file, commands_list: GraphCommandsList):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :return: the index in info_list of the data field, and of the coordinate the lines go along
+
+    about: the coordinate is the axis that is one of the dimensions of the other axis
+    """
+    x_axis_name = commands_list.info_list[commands_list.x_axis]
+    y_axis_name = commands_list.info_list[commands_list.y_axis]
+    if x_axis_name in nfh.dimensions_of_variable_list(netcdf_file, y_axis_name):
+        return commands_list.y_axis, commands_list.x_axis
+    if y_axis_name in nfh.dimensions_of_variable_list(netcdf_file, x_axis_name):
+        return commands_list.x_axis, commands_list.y_axis
+    raise Exception("one of the graph's axes must be a dimension of the other axis")
+
+
+def find_line_dimension(commands_list: GraphCommandsList, line_label):
+    """
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param line_label: the index in info_list of the coordinate the lines go along
+    :return: the name of the FieldIndexes field of the coordinate: 'time', 'depth', 'lat' or 'lon'
+    """
+    for line_dimension in ['time', 'depth', 'lat', 'lon']:
+        if getattr(commands_list, line_dimension) == line_label:
+            return line_dimension
+    raise Exception("the graph's lines can go only along the time, depth, latitude or longitude")
+
+
+def get_lines_points(commands_list: GraphCommandsList, line_dimension):
+    """
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param line_dimension: the coordinate the lines go along: 'time', 'depth', 'lat' or 'lon'
+    :return: a list of dictionaries, one for every line, with the time, depth, lat and lon index the line is taken at
+
+    call_example:
+    get_lines_points(commands_list, 'time') with lat_values = [3, 4] and lon_values = [7]
+    -> [{'time': 0, 'depth': 0, 'lat': 3, 'lon': 7}, {'time': 0, 'depth': 0, 'lat': 4, 'lon': 7}]
+    """
+    dimensions_values = {'time': commands_list.time_values or [commands_list.current_time_value],
+                         'depth': commands_list.depth_values or [commands_list.current_depth_value],
+                         'lat': commands_list.lat_values,
+                         'lon': commands_list.lon_values}
+
+    # the lines go along line_dimension, so they are not taken at an index of it
+    dimensions_values[line_dimension] = [0]
+    return [dict(zip(dimensions_values, line_point)) for line_point in itertools.product(*dimensions_values.values())]
+
+
+@Instrumentation.timed_stage
+def get_lines_values(netcdf_file, field_name, field_indexes, line_dimension, lines_points):
+    """
+    :param netcdf_file: the netCDF file
+    :param field_name: the name of the data field as it is written in the netCDF file
+    :param field_indexes: a FieldIndexes object with field_name's index for every dimension
+    :param line_dimension: the coordinate the lines go along: 'time', 'depth', 'lat' or 'lon'
+    :param lines_points: a list of dictionaries with the time, depth, lat and lon index of every line
+    :return: a list of 1D arrays, the values of every line
+
+    about: reading the lines from the netCDF file in one pass along line_dimension. For every chunk of line_chunk_size
+    values along it, the chunk of every line is read, so a long time series of many points never needs more than the
+    lines themselves in memory, and the file is read in order. The variable's chunk cache holds the chunks of one read,
+    so lines of nearby points take them from the cache.
+    """
+    variable = netcdf_file[field_name]
+    line_axis = getattr(field_indexes, line_dimension)
+
+    # the chunks along the line start at the variable's chunk boundaries, so no chunk is decompressed twice
+    lines_parts = [[] for _ in lines_points]
+    for chunk_slice in nfh.plan_chunk_aligned_slices(variable, line_axis, line_chunk_size):
+        for line_parts, line_point in zip(lines_parts, lines_points):
+            line_index = list(nfh.make_slab_index(variable.ndim, field_indexes, line_point['time'], line_point['depth'],
+                                                  line_point['lat'], line_point['lon']))
+            line_index[line_axis] = chunk_slice
+            line_parts.append(nfh.read_values(variable, tuple(line_index), access_pattern="series"))
+    return [np.concatenate(line_parts) for line_parts in lines_parts]
+
+
+def get_coordinate_values(netcdf_file, coordinate_name, index=slice(None)):
+    """
+    :param netcdf_file: the netCDF file
+    :param coordinate_name: the name of the coordinate as it is written in the netCDF file
+    :param index: the index or slice of the wanted values, all of them by default
+    :return: the values of the coordinate. time coordinates with units like 'hours since 1900-01-01' are converted to
+    dates
+    """
+    coordinate_values = nfh.read_values(netcdf_file[coordinate_name], index, np.float64)
+    coordinate_variable = netcdf_file[coordinate_name]
+    if 'units' in coordinate_variable.ncattrs() and ' since ' in coordinate_variable.getncattr('units'):
+        calendar = coordinate_variable.getncattr('calendar') if 'calendar' in coordinate_variable.ncattrs() \
+            else 'standard'
+        try:
+            return nc.num2date(coordinate_values, coordinate_variable.getncattr('units'), calendar,
+                               only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+        except ValueError:
+            # dates that python's datetime can't hold, like in a 360 days calendar, stay numbers
+            pass
+    return coordinate_values
+
+
+def make_line_name(netcdf_file, commands_list: GraphCommandsList, line_point):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param line_point: a dictionary with the time, depth, lat and lon index of the line
+    :return: the name of the line for the graph's legend, with the lat and lon values of the point
+
+    call_example:
+    make_line_name(netcdf_file, commands_list, {'time': 0, 'depth': 0, 'lat': 3, 'lon': 7})
+    -> 'latitude=31.5 longitude=34'
+    """
+    line_name_parts = []
+    for dimension in ['time', 'depth', 'lat', 'lon']:
+        dimension_label = getattr(commands_list, dimension)
+        if dimension_label is None or dimension_label in [commands_list.x_axis, commands_list.y_axis]:
+            continue
+        coordinate_name = commands_list.info_list[dimension_label]
+        coordinate_value = get_coordinate_values(netcdf_file, coordinate_name, line_point[dimension])
+        if isinstance(coordinate_value, np.ndarray):
+            coordinate_value = format(float(coordinate_value), "g")
+        line_name_parts.append(coordinate_name + "=" + str(coordinate_value))
+    return " ".join(line_name_parts)
+
+
+# a class that keeps running statistics of values that come in chunks: the count, mean, variance, minimum and maximum
+# of every point. The chunks are merged by the parallel version of Welford's algorithm (Chan et al.), so the variance
+# stays accurate over long records. NaN values are skipped.
+class RunningStatistics:
+    count: np.ndarray  # the number of values of every point
+    mean: np.ndarray  # the mean of every point
+    m2: np.ndarray  # the sum of the squared differences from the mean of every point
+    min: np.ndarray
+    max: np.ndarray
+
+    def __init__(self, shape=()):
+        self.count = np.zeros(shape, np.int64)
+        self.mean = np.zeros(shape, np.float64)
+        self.m2 = np.zeros(shape, np.float64)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def update(self, values):
+        """
+        :param values: an array of new values, the first axis is the values of every point
+
+        about: computing the statistics of the chunk, and merging them into the running statistics
+        """
+        is_valid = ~np.isnan(values)
+        chunk_count = is_valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk_mean = np.where(is_valid, values, 0).sum(axis=0, dtype=np.float64) / chunk_count
+            chunk_m2 = np.square(np.where(is_valid, values - chunk_mean, 0), dtype=np.float64).sum(axis=0)
+            total_count = self.count + chunk_count
+            chunk_part = chunk_count / total_count
+        delta = chunk_mean - self.mean
+
+        # points without new values keep their statistics
+        has_values = chunk_count > 0
+        self.mean = np.where(has_values, self.mean + delta * chunk_part, self.mean)
+        self.m2 = np.where(has_values, self.m2 + chunk_m2 + np.square(delta) * self.count * chunk_part, self.m2)
+        self.count = total_count
+        self.min = np.fmin(self.min, np.fmin.reduce(values, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(values, axis=0))
+
+    def get_mean(self):
+        """
+        :return: the mean of every point, NaN for points without values
+        """
+        return np.where(self.count > 0, self.mean, np.nan)
+
+    def get_std(self, ddof=0):
+        """
+        :param ddof: delta degrees of freedom, the variance is divided by count - ddof
+        :return: the standard deviation of every point, NaN for points without enough values
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan))
+
+    def get_min(self):
+        """
+        :return: the minimum of every point, NaN for points without values
+        """
+        return np.where(self.count > 0, self.min, np.nan)
+
+    def get_max(self):
+        """
+        :return: the maximum of every point, NaN for points without values
+        """
+        return np.where(self.count > 0, self.max, np.nan)
+
+
+def get_region_slices(commands_list: GraphCommandsList):
+    """
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :return: the latitude slice and longitude slice of the region between the chosen points
+
+    call_example:
+    get_region_slices(commands_list) with lat_values = [10, 12, 20] and lon_values = [0]
+    -> slice(10, 21), slice(0, 1)
+    """
+    return (slice(min(commands_list.lat_values), max(commands_list.lat_values) + 1),
+            slice(min(commands_list.lon_values), max(commands_list.lon_values) + 1))
+
+
+def read_time_chunks(netcdf_file, commands_list: GraphCommandsList, field_name, lat_slice=slice(None),
+                     lon_slice=slice(None)):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param field_name: the name of the data field as it is written in the netCDF file
+    :param lat_slice: the part of the latitude dimension to read
+    :param lon_slice: the part of the longitude dimension to read
+    :return: a generator of (time slice, values) pairs, the values in (time, lat, lon) order
+
+    about: reading the region in chunks along the time, one after the other. A chunk is as many time steps as fit in
+    reduction_chunk_bytes, rounded to the variable's chunks, so the memory does not depend on the length of the record.
+    """
+    variable = netcdf_file[field_name]
+    field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, field_name, commands_list)
+    region_size = len(range(*lat_slice.indices(variable.shape[field_indexes.lat]))) * \
+        len(range(*lon_slice.indices(variable.shape[field_indexes.lon])))
+    chunk_length = max(1, reduction_chunk_bytes // max(1, region_size * np.dtype(nfh.values_dtype).itemsize))
+
+    # the dimensions that are left after indexing are time, lat and lon, in the order of the variable
+    left_dimensions = sorted([field_indexes.time, field_indexes.lat, field_indexes.lon])
+    axes_order = [left_dimensions.index(field_indexes.time), left_dimensions.index(field_indexes.lat),
+                  left_dimensions.index(field_indexes.lon)]
+
+    for time_slice in nfh.plan_chunk_aligned_slices(variable, field_indexes.time, chunk_length):
+        slab_index = nfh.make_slab_index(variable.ndim, field_indexes, time_slice, commands_list.current_depth_value,
+                                         lat_slice, lon_slice)
+        yield time_slice, nfh.read_values(variable, slab_index, access_pattern="scan").transpose(axes_order)
+
+
+def get_area_weights(netcdf_file, commands_list: GraphCommandsList, lat_slice=slice(None)):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param lat_slice: the part of the latitude dimension of the region
+    :return: an array in the shape (lat, 1) of the area weight of every latitude, cos(lat)
+
+    about: on a regular latitude-longitude grid, the area of a grid cell is proportional to the cosine of its latitude
+    """
+    lat = nfh.read_values(netcdf_file[commands_list.info_list[commands_list.lat]], lat_slice, np.float64)
+    return np.clip(np.cos(np.deg2rad(lat)), 0, None)[:, np.newaxis]
+
+
+def get_area_means(values, area_weights):
+    """
+    :param values: an array of values in (time, lat, lon) order
+    :param area_weights: an array in the shape (lat, 1) of the area weight of every latitude
+    :return: the area weighted mean of every time step. missing values are left out of the mean and its weights
+    """
+    is_valid = ~np.isnan(values)
+    weights_sum = (is_valid * area_weights).sum(axis=(1, 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.where(is_valid, values, 0) * area_weights).sum(axis=(1, 2), dtype=np.float64) / weights_sum
+
+
+@Instrumentation.timed_stage
+def get_area_statistics(netcdf_file, commands_list: GraphCommandsList, field_name, lat_slice=slice(None),
+                        lon_slice=slice(None)):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param field_name: the name of the data field as it is written in the netCDF file
+    :param lat_slice: the part of the latitude dimension of the region
+    :param lon_slice: the part of the longitude dimension of the region
+    :return: a dictionary of arrays along the time: "mean" - the area weighted mean of the region, "min" and "max" -
+    the minimum and maximum of the region, and "percentiles" - an array in the shape (len(envelope_percentiles), time)
+    of the percentiles of the region's values
+
+    about: reducing a region to its statistics at every time step, chunk after chunk along the time. The percentiles
+    are of the grid points' values, without area weights.
+    """
+    area_weights = get_area_weights(netcdf_file, commands_list, lat_slice)
+    time_size = netcdf_file[field_name].shape[
+        nfh.find_indexes_in_dimension_list(netcdf_file, field_name, commands_list).time]
+    area_statistics = {"mean": np.empty(time_size), "min": np.empty(time_size), "max": np.empty(time_size),
+                       "percentiles": np.empty((len(envelope_percentiles), time_size))}
+
+    for time_slice, values in read_time_chunks(netcdf_file, commands_list, field_name, lat_slice, lon_slice):
+        area_statistics["mean"][time_slice] = get_area_means(values, area_weights)
+        points_values = values.reshape(values.shape[0], -1)
+        area_statistics["min"][time_slice] = np.fmin.reduce(points_values, axis=1)
+        area_statistics["max"][time_slice] = np.fmax.reduce(points_values, axis=1)
+        area_statistics["percentiles"][:, time_slice] = np.nanpercentile(points_values, envelope_percentiles, axis=1)
+    return area_statistics
+
+
+def get_months(netcdf_file, time_name):
+    """
+    :param netcdf_file: the netCDF file
+    :param time_name: the name of the time coordinate as it is written in the netCDF file
+    :return: an array of the month, 1 to 12, of every time step
+    """
+    time_variable = netcdf_file[time_name]
+    if 'units' not in time_variable.ncattrs() or ' since ' not in time_variable.getncattr('units'):
+        raise Exception("a climatology needs a time coordinate with units like 'hours since 1900-01-01'")
+    calendar = time_variable.getncattr('calendar') if 'calendar' in time_variable.ncattrs() else 'standard'
+    dates = nc.num2date(nfh.read_values(time_variable, slice(None), np.float64), time_variable.getncattr('units'),
+                        calendar)
+    return np.array([date.month for date in np.ravel(dates)])
+
+
+@Instrumentation.timed_stage
+def get_monthly_climatology(netcdf_file, commands_list: GraphCommandsList, field_name, lat_slice=slice(None),
+                            lon_slice=slice(None), is_area_mean=True):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the GraphCommandsList type that contains all the information we need to build
+    the graph.
+    :param field_name: the name of the data field as it is written in the netCDF file
+    :param lat_slice: the part of the latitude dimension of the region
+    :param lon_slice: the part of the longitude dimension of the region
+    :param is_area_mean: True for the climatology of the region's area mean, False for the climatology of every grid
+    point
+    :return: a list of 12 RunningStatistics objects, one for every month
+
+    about: accumulating the time steps of every month, chunk after chunk along the time. The statistics of a month
+    are over all its time steps in all the years of the record.
+    """
+    months = get_months(netcdf_file, commands_list.info_list[commands_list.time])
+    area_weights = get_area_weights(netcdf_file, commands_list, lat_slice) if is_area_mean else None
+    monthly_statistics = None
+
+    for time_slice, values in read_time_chunks(netcdf_file, commands_list, field_name, lat_slice, lon_slice):
+        if is_area_mean:
+            values = get_area_means(values, area_weights)
+        if monthly_statistics is None:
+            monthly_statistics = [RunningStatistics(values.shape[1:]) for _ in range(12)]
+        chunk_months = months[time_slice]
+        for month in np.unique(chunk_months):
+            monthly_statistics[month - 1].update(values[chunk_months == month])
+    return monthly_statistics
+
+
+def draw_area_statistics(ax, time_coordinate, area_statistics, is_field_on_x):
+    """
+    :param ax: the matplotlib axes the graph is drawn on
+    :param time_coordinate: the values of the time coordinate
+    :param area_statistics: the dictionary get_area_statistics() returns
+    :param is_field_on_x: is the data field on the x axis
+
+    about: drawing the area mean, with the min-max envelope and the percentiles envelope around it
+    """
+    draw_envelope(ax, time_coordinate, area_statistics["min"], area_statistics["max"], is_field_on_x, alpha=0.15,
+                  label="min - max")
+    draw_envelope(ax, time_coordinate, area_statistics["percentiles"][0], area_statistics["percentiles"][-1],
+                  is_field_on_x, alpha=0.3, label=str(envelope_percentiles[0]) + "% - " +
+                  str(envelope_percentiles[-1]) + "%")
+    draw_line(ax, time_coordinate, area_statistics["mean"], is_field_on_x, label="area mean")
+
+
+def draw_monthly_climatology(ax, monthly_statistics, is_field_on_x):
+    """
+    :param ax: the matplotlib axes the graph is drawn on
+    :param monthly_statistics: the list of 12 RunningStatistics objects get_monthly_climatology() returns
+    :param is_field_on_x: is the data field on the x axis
 
-def make_graph_2d(netcdf_file, commands_list: GraphCommandsList):
-    pass
+    about: drawing the climatological mean of every month, with the min-max envelope and the standard deviation
+    envelope around it
+    """
+    months = np.arange(1, 13)
+    means = np.array([statistics.get_mean() for statistics in monthly_statistics])
+    stds = np.array([statistics.get_std() for statistics in monthly_statistics])
+    draw_envelope(ax, months, [statistics.get_min() for statistics in monthly_statistics],
+                  [statistics.get_max() for statistics in monthly_statistics], is_field_on_x, alpha=0.15,
+                  label="min - max")
+    draw_envelope(ax, months, means - stds, means + stds, is_field_on_x, alpha=0.3, label="mean +- std")
+    draw_line(ax, months, means, is_field_on_x, marker="o", label="climatological mean")
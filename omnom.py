@@ -4,88 +4,531 @@ This module contains functions about map buildings and fields arrangement
 
 algorithm: Map making starts with make_map(). This function finds whether the map is vectorial or scalar and calls for
 the corresponding function, make_map_vectorial() or make_map_scalar(). both of the functions start with making the map
-base, same for both, with make_map_base(). Then they get the values of the vectors used to build the map, and arrange
-them in a specific order: time, depth, lat, lon with the arrange_fields() function and the
-nfh.find_indexes_in_dimension_list() function. While make_map_scalar() does the two latter actions by itself,
+base, same for both, with make_map_base(). Then they find the order of the dimensions the fields depend on with the
+nfh.find_indexes_in_dimension_list() function, and read from the file only the lat-lon slab of the current time and
+depth values with a FieldSlicer object. FieldSlicer gives the same slab as the time, depth, lat, lon arranged field of
+arrange_fields(), without reading or arranging the whole field. While make_map_scalar() does the two latter actions by itself,
 make_map_vectorial() calls for make_polar_components() or make_cartesian_components() function to do it, depending on
 the coordinate system.
 Afterwards, they use contourf and quiver from matplotlib.pyplot to draw the data on the map. At this stage the user
 preferences can be used to customize the map, using the MapCommandsList object, commands_list, from InputManager.
+When commands_list has the corners of the map, only the part of the grid between them is read.
+A grid with more points than the pixels of the map is drawn in a lower level of detail: get_map_domain() finds how
+many grid points fall in one pixel of the axes, and the fields are read strided and averaged in blocks to about one
+cell per pixel, unless commands_list.is_full_resolution is set.
 
 """
 import netCDF_file_handler as nfh
 from netCDF_file_handler import FieldIndexes
 import numpy as np
-from mpl_toolkits.basemap import Basemap
-import matplotlib.pyplot as plt
 from InputManager import MapCommandsList
+import OutputManager
+import Instrumentation
+import hashlib
+import pickle
+import os
+import copy
+import glob
+import math
+import queue
+import threading
+from collections import OrderedDict
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+
+# an in-process cache of the map bases: Basemap objects and their projected grids, by the key from get_map_cache_key(),
+# from the least recently used
+map_base_cache = OrderedDict()
+
+# the maximum number of map bases that are kept in the in-process cache. the least recently used map base is dropped
+# when a new one is added
+max_map_bases = 8
+
+# the directory of the on-disk cache of the map bases. setting it to None turns the on-disk cache off
+map_base_cache_directory = os.path.join(os.path.expanduser("~"), ".nom_cache", "map_base")
+
+# the maximum size of the on-disk cache of the map bases, in bytes. the least recently used files are deleted to make
+# room for a new one
+max_map_base_cache_bytes = 2 ** 30
+
+# the most grid points along each axis that are averaged into one cell of a map in a lower level of detail. Coarser
+# levels of detail read the grid strided, so a map never reads more than about this number squared points per pixel
+lod_averaged_points = 4
+
+# the number of frames whose data is read ahead by a background thread while a frame is drawn. 0 reads the data of
+# every frame when it is drawn
+prefetch_depth = 2
+
+# the keys of a job that can be changed when a map is drawn again from its bundle. The other keys need the data to be read
+# again from the netCDF file
+bundle_preference_keys = ["quiver_color", "quiver_space", "width", "height", "resolution", "projection", "fig_format",
+                          "fig_location", "name_of_fig"]
+
+# the names of the arrays of the data a bundle keeps, for scalar fields and for vector fields
+bundle_field_names = {False: ["scalar_field"], True: ["lat_component", "lon_component", "vector_size"]}
+
+# the state of a frame rendering worker process: the path of the netCDF file of its current frames, the open file, and
+# its figure with a drawn map base. only the current file is kept, the state of the previous file is freed
+frame_worker_netcdf_path = None
+frame_worker_netcdf_file = None
+frame_worker_map_base = None
+
+
+def make_map(netcdf_file, commands_list: MapCommandsList, ax=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map.
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
+
+    about: this function creates a vectorial or a scalar map, depends on the the value of commands_list.is_vector_field
+    """
+    if commands_list.is_vector_field:
+        make_map_vectorial(netcdf_file, commands_list, ax)
+    else:
+        make_map_scalar(netcdf_file, commands_list, ax)
 
 
-def make_map(netcdf_file, commands_list: MapCommandsList):
+@Instrumentation.timed_stage
+def make_map_frames(netcdf_file, commands_list: MapCommandsList, plt_figure):
     """
     :param netcdf_file: the netCDF file
     :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
     map.
+    :param plt_figure: the figure the maps are drawn on, a pyplot figure or a headless figure
+    :return: a list of the frames' file names, by the frames order
+
+    about: this function creates and saves a map for every time and depth value in commands_list. The base of the map is
+    made once, and for every frame only the slabs of its time and depth are read and drawn on it. The slabs of the next
+    frames are read by a FramePrefetcher while a frame is drawn. When there are a few frames in a raster format, the
+    base is also rendered once, and every frame renders only its data. In an animation
+    format all the frames are written to one file, every frame as soon as it is drawn. In the bundle format every frame
+    is saved as a bundle with print_map_bundle(), and only the last frame is drawn. The last frame stays drawn on
+    plt_figure.
+    """
+    # making the base of the map, same for all the frames
+    ax = plt_figure.gca()
+    xx, yy = make_map_base(netcdf_file, commands_list, ax)
+
+    frames = get_frames_values(commands_list)
+    compositor = OutputManager.make_base_layer_compositor(plt_figure, commands_list) if len(frames) > 1 else None
+    animation_writer = OutputManager.make_animation_writer(plt_figure, commands_list) \
+        if commands_list.fig_format in OutputManager.animation_formats else None
+    # the coordinates of the map domain's cells, that every bundle keeps
+    is_bundle = commands_list.fig_format == OutputManager.bundle_format
+    bundle_coordinates = nfh.get_domain_coordinates(netcdf_file, commands_list.info_list[commands_list.lat],
+                                                    commands_list.info_list[commands_list.lon],
+                                                    commands_list.map_domain) if is_bundle else None
+    # reading the data of the next frames in the background while a frame is drawn
+    prefetcher = FramePrefetcher(get_bundle_commands_list(commands_list) if is_bundle else commands_list, frames,
+                                 prefetch_depth) if len(frames) > 1 and prefetch_depth > 0 else None
+    fig_file_names = []
+    try:
+        for frame_number, (time_value, depth_value) in enumerate(frames):
+            commands_list.current_time_value = time_value
+            commands_list.current_depth_value = depth_value
+            map_data = prefetcher.get() if prefetcher is not None else None
+
+            # saving the frame's bundle, and drawing only the last frame
+            if is_bundle:
+                map_data = print_map_bundle(netcdf_file, commands_list, bundle_coordinates, map_data)
+                if frame_number == len(frames) - 1:
+                    draw_map_data(netcdf_file, commands_list, xx, yy, ax, map_data)
+                fig_file_names.append(OutputManager.get_fig_file_name(commands_list))
+                continue
+
+            # drawing the frame's data and saving the figure, or adding it to the animation
+            artists = draw_map_data(netcdf_file, commands_list, xx, yy, ax, map_data)
+            if animation_writer is not None:
+                animation_writer.write_frame(compositor.render_frame() if compositor is not None else
+                                             OutputManager.render_fig(plt_figure))
+            elif compositor is not None:
+                compositor.print_frame(commands_list)
+            else:
+                OutputManager.print_fig(plt_figure, commands_list)
+            fig_file_names.append(OutputManager.get_fig_file_name(commands_list))
+
+            # removing the frame's data from the base, unless it is the last frame
+            if frame_number < len(frames) - 1:
+                for artist in artists:
+                    artist.remove()
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+
+    if animation_writer is not None:
+        animation_writer.close()
+        return [animation_writer.file_name]
+    return fig_file_names
+
+
+def make_map_frames_parallel(commands_list: MapCommandsList, netcdf_paths=None, max_workers=None):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map.
+    :param netcdf_paths: a list of paths of netCDF files with the same structure to make the frames of. defaults to
+    commands_list.netcdf_path
+    :param max_workers: the number of processes to use. defaults to the number of CPUs
+    :return: a list of the frames' file names, by the frames order
+
+    about: this function creates and saves a map for every netCDF file and every time and depth value in commands_list,
+    like make_map_frames(), but spreads the frames between a few processes. Every process opens its own netCDF files
+    and keeps its map base, rendered once in raster formats, so it only reads, draws and renders the data of every
+    frame it gets. When there is more than one netCDF file, the name of the file is added to the frames names.
+    """
+    if netcdf_paths is None:
+        netcdf_paths = [commands_list.netcdf_path]
+
+    # making a commands list for every frame, with its own netCDF path, time value and depth value
+    frames_commands_lists = []
+    for netcdf_path in netcdf_paths:
+        for time_value, depth_value in get_frames_values(commands_list):
+            frame_commands_list = copy.copy(commands_list)
+            frame_commands_list.netcdf_path = netcdf_path
+            frame_commands_list.current_time_value = time_value
+            frame_commands_list.current_depth_value = depth_value
+            if len(netcdf_paths) > 1:
+                frame_commands_list.name_of_fig += "_" + os.path.splitext(os.path.basename(netcdf_path))[0]
+            frames_commands_lists.append(frame_commands_list)
+
+    # giving every process a few frames in a row, so they mostly come from the same file
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, math.ceil(len(frames_commands_lists) / (max_workers * 4)))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(make_frame_in_worker, frames_commands_lists, chunksize=chunksize))
+
+
+def make_frame_in_worker(commands_list: MapCommandsList):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    frame, including its netCDF path, time value and depth value.
+    :return: the frame's file name
 
-    about: this function creates a vectorial or a scalar map, depends on the the value of commands_list.is_vector_field
+    about: this function creates and saves one frame inside a frame rendering worker process. The netCDF file is opened
+    and the map base is drawn only for the first frame of every file the worker gets, the next frames replace only the
+    data drawn on it. When the worker gets a frame of another file, the previous file is closed and its figure freed.
+    The workers draw on headless figures, so they never use an interactive backend.
+    """
+    global frame_worker_netcdf_path, frame_worker_netcdf_file, frame_worker_map_base
+    netcdf_path = commands_list.netcdf_path
+    if netcdf_path != frame_worker_netcdf_path:
+        release_frame_worker()
+        frame_worker_netcdf_file = nfh.open_netcdf(netcdf_path)
+        plt_figure = OutputManager.make_headless_figure()
+        xx, yy = make_map_base(frame_worker_netcdf_file, commands_list, plt_figure.gca())
+        compositor = OutputManager.make_base_layer_compositor(plt_figure, commands_list)
+        frame_worker_map_base = plt_figure, xx, yy, commands_list.map_domain, compositor, []
+        frame_worker_netcdf_path = netcdf_path
+    plt_figure, xx, yy, commands_list.map_domain, compositor, artists = frame_worker_map_base
+
+    # removing the previous frame's data and drawing this frame's data on the map base
+    for artist in artists:
+        artist.remove()
+    artists[:] = draw_map_data(frame_worker_netcdf_file, commands_list, xx, yy, plt_figure.gca())
+    if compositor is not None:
+        compositor.print_frame(commands_list)
+    else:
+        OutputManager.print_fig(plt_figure, commands_list)
+    return OutputManager.get_fig_file_name(commands_list)
+
+
+def release_frame_worker():
+    """
+    about: closing the netCDF file of a frame rendering worker process and freeing its figure, before it draws the
+    frames of another file
+    """
+    global frame_worker_netcdf_path, frame_worker_netcdf_file, frame_worker_map_base
+    if frame_worker_netcdf_file is not None:
+        frame_worker_netcdf_file.close()
+    if frame_worker_map_base is not None:
+        OutputManager.release_fig(frame_worker_map_base[0])
+    frame_worker_netcdf_path = frame_worker_netcdf_file = frame_worker_map_base = None
+
+
+def print_map_bundle(netcdf_file, commands_list: MapCommandsList, coordinates, bundle_data=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map, after its map base was made
+    :param coordinates: the latitude and longitude vectors of the map domain's cells
+    :param bundle_data: the data of the current time and depth from read_map_data() with get_bundle_commands_list(), if
+    it was already read
+    :return: the data of the current time and depth for draw_map_data()
+
+    about: saving the data of the current time and depth, the coordinates of its cells and the commands list as a
+    bundle, that make_map_from_bundle() draws the map from again. The data is of the map domain in its level of detail,
+    and the vector components are of every cell and not only of the quivers points, so the map can be drawn again with
+    any quiver_space.
+    """
+    if bundle_data is None:
+        bundle_data = read_map_data(netcdf_file, get_bundle_commands_list(commands_list))
+    arrays = dict(zip(bundle_field_names[bool(commands_list.is_vector_field)], bundle_data))
+    arrays["lat"], arrays["lon"] = coordinates
+    OutputManager.print_bundle(commands_list, get_bundle_settings(commands_list), arrays)
+    return get_quivers_map_data(commands_list, bundle_data)
+
+
+def make_maps_from_bundles(bundle_path, preferences=None):
+    """
+    :param bundle_path: the path of a bundle, or a glob pattern of a few bundles, like 'out/msl_t*.npz'
+    :param preferences: a dictionary of the values of bundle_preference_keys to change, like {"projection": "merc"}
+    :return: a list of the names of the figures' files, by the bundles' names order
+
+    about: drawing and saving the map of every bundle again on a headless figure, without the netCDF file
+    """
+    bundle_paths = sorted(glob.glob(bundle_path)) if any(glob_char in bundle_path for glob_char in "*?[") \
+        else [bundle_path]
+    if not bundle_paths:
+        raise Exception("no bundle matches " + bundle_path)
+    plt_figure = OutputManager.make_headless_figure()
+    fig_file_names = []
+    for path in bundle_paths:
+        # the figure is cleared also when drawing a bundle fails, like run_job() does
+        try:
+            fig_file_names.append(make_map_from_bundle(path, plt_figure, preferences))
+        finally:
+            OutputManager.release_fig(plt_figure)
+    return fig_file_names
+
+
+@Instrumentation.timed_stage
+def make_map_from_bundle(bundle_path, plt_figure, preferences=None):
+    """
+    :param bundle_path: the path of a bundle saved by print_map_bundle()
+    :param plt_figure: the figure the map is drawn on
+    :param preferences: a dictionary of the values of bundle_preference_keys to change, like {"projection": "merc"}
+    :return: the name of the figure's file
+
+    about: drawing the map of a bundle and saving it, with the preferences changed. Only the map base is made again, in
+    the new projection and resolution, and the data of the bundle is drawn on it as it is. A bundle in the bundle format
+    is saved again with the changed preferences.
+    """
+    settings, arrays = OutputManager.load_bundle(bundle_path)
+    commands_list = make_bundle_commands_list(settings, preferences or {})
+    bundle_data = tuple(arrays[name] for name in bundle_field_names[bool(commands_list.is_vector_field)])
+
+    ax = plt_figure.gca()
+    xx, yy = draw_map_base(commands_list.map_properties, arrays["lat"], arrays["lon"], ax)
+    draw_map_data(None, commands_list, xx, yy, ax, get_quivers_map_data(commands_list, bundle_data))
+    if commands_list.fig_format == OutputManager.bundle_format:
+        OutputManager.print_bundle(commands_list, get_bundle_settings(commands_list), arrays)
+    else:
+        OutputManager.print_fig(plt_figure, commands_list)
+    return OutputManager.get_fig_file_name(commands_list)
+
+
+def get_bundle_commands_list(commands_list: MapCommandsList):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
+     the map.
+    :return: a copy of commands_list that read_map_data() reads the vector components of every cell with
+    """
+    bundle_commands_list = copy.copy(commands_list)
+    bundle_commands_list.quiver_space = 1
+    return bundle_commands_list
+
+
+def get_quivers_map_data(commands_list: MapCommandsList, bundle_data):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
+     the map.
+    :param bundle_data: the data of a bundle, with the vector components of every cell
+    :return: the data for draw_map_data(), with the vector components of only the quivers points
+    """
+    if not commands_list.is_vector_field:
+        return bundle_data
+    lat_component, lon_component, vector_size = bundle_data
+    quivers_slices = get_quivers_slices(commands_list)
+    return lat_component[quivers_slices], lon_component[quivers_slices], vector_size
+
+
+def get_bundle_settings(commands_list: MapCommandsList):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
+     the map, after its map base was made
+    :return: a dictionary of the values of commands_list that can be saved as JSON, with the map domain's slices as
+    [start, stop, step] lists
+    """
+    settings = dict(vars(commands_list))
+    map_domain = commands_list.map_domain
+    if map_domain is not None:
+        settings["map_domain"] = {"lat_slice": [map_domain.lat_slice.start, map_domain.lat_slice.stop,
+                                                map_domain.lat_slice.step],
+                                  "lon_slices": [[lon_slice.start, lon_slice.stop, lon_slice.step]
+                                                 for lon_slice in map_domain.lon_slices],
+                                  "lat_block": map_domain.lat_block, "lon_block": map_domain.lon_block}
+    return settings
+
+
+def make_bundle_commands_list(settings, preferences):
+    """
+    :param settings: the settings of a bundle, from get_bundle_settings()
+    :param preferences: a dictionary of the values of bundle_preference_keys to change
+    :return: the MapCommandsList object of the bundle, with the preferences changed
+    """
+    commands_list = MapCommandsList()
+    for key, value in settings.items():
+        setattr(commands_list, key, value)
+    if commands_list.map_domain is not None:
+        commands_list.map_domain = nfh.MapDomain(slice(*settings["map_domain"]["lat_slice"]),
+                                                 [slice(*lon_slice) for lon_slice in
+                                                  settings["map_domain"]["lon_slices"]],
+                                                 settings["map_domain"]["lat_block"],
+                                                 settings["map_domain"]["lon_block"])
+
+    # the data of the bundle is already read, so only the way it is drawn can change
+    for key, value in preferences.items():
+        if key not in bundle_preference_keys:
+            raise Exception(key + " can't be changed when drawing a map from its bundle, the data must be read again "
+                                  "from the netCDF file")
+        setattr(commands_list, key, value)
+    commands_list.map_properties = dict(commands_list.map_properties, resolution=commands_list.resolution,
+                                        projection=commands_list.projection)
+    return commands_list
+
+
+def get_frames_values(commands_list):
+    """
+    :param commands_list: an object that contains all the information we need to build the figure.
+    :return: a list of (time value, depth value) tuples, one for every frame
+
+    about: finding the time and depth values of every frame. If there are no time_values or depth_values in
+    commands_list, the current time or depth value is used.
+
+    call_example:
+    get_frames_values(commands_list) with time_values = [0, 4] and current_depth_value = 2
+    -> [(0, 2), (4, 2)]
+    """
+    time_values = commands_list.time_values or [commands_list.current_time_value]
+    depth_values = commands_list.depth_values or [commands_list.current_depth_value]
+    return [(time_value, depth_value) for time_value in time_values for depth_value in depth_values]
+
+
+def draw_map_data(netcdf_file, commands_list: MapCommandsList, xx, yy, ax=None, map_data=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map.
+    :param xx: the x axis of the map, from make_map_base()
+    :param yy: the y axis of the map, from make_map_base()
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
+    :param map_data: the data of the current time and depth from read_map_data(), if it was already read
+    :return: a list of the drawn artists
+
+    about: this function draws the data of the current time and depth on an existing map base, vectorial or scalar
+    depends on the the value of commands_list.is_vector_field
     """
     if commands_list.is_vector_field:
-        make_map_vectorial(netcdf_file, commands_list)
+        return draw_map_vectorial(netcdf_file, commands_list, xx, yy, ax, map_data)
     else:
-        make_map_scalar(netcdf_file, commands_list)
+        return draw_map_scalar(netcdf_file, commands_list, xx, yy, ax, map_data)
+
+
+@Instrumentation.timed_stage
+def read_map_data(netcdf_file, commands_list: MapCommandsList):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map.
+    :return: a tuple of the arrays the map of the current time and depth draws: the slab of the scalar field, or the
+    latitude and longitude components at the quivers points and the slab of the size of the vector field
+
+    about: reading the data of the current time and depth without drawing it, so FramePrefetcher can read the data of
+    the next frames while a frame is drawn
+    """
+    if commands_list.is_vector_field and commands_list.is_polar:
+        return make_polar_components(netcdf_file, commands_list)
+    if commands_list.is_vector_field:
+        return make_cartesian_components(netcdf_file, commands_list)
+    scalar_field_name = commands_list.info_list[commands_list.scalar_field_label]
+    return (FieldSlicer(netcdf_file, scalar_field_name, commands_list)[commands_list.current_time_value,
+                                                                       commands_list.current_depth_value],)
 
 
 # Making a map, assuming scalar field
-def make_map_scalar(netcdf_file, commands_list: MapCommandsList):
+def make_map_scalar(netcdf_file, commands_list: MapCommandsList, ax=None):
     """
     :param netcdf_file: the netCDF file
     :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
     map.
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
 
     about: this function creates a scalar map
     """
     # making the base of the map
-    xx, yy = make_map_base(netcdf_file, commands_list)
+    xx, yy = make_map_base(netcdf_file, commands_list, ax)
+    draw_map_scalar(netcdf_file, commands_list, xx, yy, ax)
 
-    # getting the values of the scalar field.
-    scalar_field_name = commands_list.info_list[commands_list.scalar_field_label]
-    scalar_field = nfh.get_values(netcdf_file, scalar_field_name)
 
-    # finding the order of the dimensions the fields depends on and arranging the field's dimensions order to:
-    # time, depth, lat, lon
-    field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, scalar_field_name, commands_list)
-    scalar_field = arrange_fields(scalar_field, commands_list, field_indexes)
+def draw_map_scalar(netcdf_file, commands_list: MapCommandsList, xx, yy, ax=None, map_data=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map.
+    :param xx: the x axis of the map, from make_map_base()
+    :param yy: the y axis of the map, from make_map_base()
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
+    :param map_data: the data of the current time and depth from read_map_data(), if it was already read
+    :return: a list of the drawn artists
+
+    about: this function draws a scalar field of the current time and depth on an existing map base
+    """
+    # reading only the slab of the current time and depth of the scalar field, unless it was already read
+    if map_data is None:
+        map_data = read_map_data(netcdf_file, commands_list)
+    scalar_field, = map_data
 
     # drawing the field on the map
-    plt.contourf(xx, yy, scalar_field[commands_list.current_time_value][commands_list.current_depth_value])
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    with Instrumentation.stage("contourf"):
+        return [ax.contourf(xx, yy, scalar_field)]
 
 
-def make_map_vectorial(netcdf_file, commands_list: MapCommandsList):
+def make_map_vectorial(netcdf_file, commands_list: MapCommandsList, ax=None):
     """
     :param netcdf_file: the netCDF file
     :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
     map.
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
 
     about: this function creates a vectorial map
     """
     # making the base of the map
-    xx, yy = make_map_base(netcdf_file, commands_list)
+    xx, yy = make_map_base(netcdf_file, commands_list, ax)
+    draw_map_vectorial(netcdf_file, commands_list, xx, yy, ax)
 
-    # splitting the two cases of scalar and vectorial maps
-    if commands_list.is_polar:
-        lat_component, lon_component, vector_size = make_polar_components(netcdf_file, commands_list)
-    else:
-        lat_component, lon_component, vector_size = make_cartesian_components(netcdf_file, commands_list)
+
+def draw_map_vectorial(netcdf_file, commands_list: MapCommandsList, xx, yy, ax=None, map_data=None):
+    """
+    :param netcdf_file: the netCDF file
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
+    map.
+    :param xx: the x axis of the map, from make_map_base()
+    :param yy: the y axis of the map, from make_map_base()
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
+    :param map_data: the data of the current time and depth from read_map_data(), if it was already read
+    :return: a list of the drawn artists
+
+    about: this function draws a vector field of the current time and depth on an existing map base
+    """
+    # reading the polar or cartesian components, unless they were already read. the components are only of the quivers
+    # points
+    if map_data is None:
+        map_data = read_map_data(netcdf_file, commands_list)
+    lat_component, lon_component, vector_size = map_data
 
     # drawing the vectors and their total sizes
-    plt.contourf(xx, yy, vector_size[commands_list.current_time_value][commands_list.current_depth_value])
-    plt.quiver(xx[::commands_list.quiver_space, ::commands_list.quiver_space],
-               yy[::commands_list.quiver_space, ::commands_list.quiver_space],
-               lat_component[commands_list.current_time_value][commands_list.current_depth_value][
-               ::commands_list.quiver_space, ::commands_list.quiver_space],
-               lon_component[commands_list.current_time_value][commands_list.current_depth_value][
-               ::commands_list.quiver_space, ::commands_list.quiver_space],
-               color='r')
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    quivers_slices = get_quivers_slices(commands_list)
+    with Instrumentation.stage("contourf"):
+        vector_size_contour = ax.contourf(xx, yy, vector_size)
+    with Instrumentation.stage("quiver"):
+        vector_quiver = ax.quiver(xx[quivers_slices], yy[quivers_slices], lat_component, lon_component, color='r')
+    return [vector_size_contour, vector_quiver]
 
 
 def make_polar_components(netcdf_file, commands_list: MapCommandsList):
@@ -93,29 +536,31 @@ def make_polar_components(netcdf_file, commands_list: MapCommandsList):
     :param netcdf_file: the netCDF file
     :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
     map.
-    :return: a vector containing the field's latitude, longitude and size components
+    :return: the field's latitude and longitude components at the quivers points, and the field's size as a lat-lon slab
+    of the current time and depth
 
-    about: extracts the polar data from a netcdf file , reorders them in a predefined order, and projects them to
-    latitude,longitude, and size
+    about: extracts the polar data of the current time and depth from a netcdf file, and projects them to
+    latitude,longitude, and size. Only the size is needed for every point of the map, so the angle is read, and the
+    components are calculated, only for every quiver_space-th point, where the quivers are drawn.
     """
     # getting the names of the size and angular vector fields as they are written in the netCDF file, from the info list
     vector_size_field_name = commands_list.info_list[commands_list.rad_component]
     vector_ang_field_name = commands_list.info_list[commands_list.ang_component]
 
-    # getting the values of the fields from the netCDF file
-    vector_size = nfh.get_values(netcdf_file, vector_size_field_name)
-    vector_ang = nfh.get_values(netcdf_file, vector_ang_field_name)
-
-    # finding the order of the dimensions the fields depends on and arranging the fields's dimensions order to:
-    # time, depth, lat, lon
-    vector_size_field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, vector_size_field_name,
-                                                                   commands_list)
-    vector_ang_field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, vector_ang_field_name, commands_list)
-    vector_size = arrange_fields(vector_size, commands_list, vector_size_field_indexes)
-    vector_ang = arrange_fields(vector_ang, commands_list, vector_ang_field_indexes)
-
-    lat_component = vector_size * np.cos(vector_ang * np.pi / 180 + np.pi / 2)
-    lon_component = vector_size * np.sin(vector_ang * np.pi / 180 + np.pi / 2)
+    # reading the slab of the current time and depth of the size, and only the quivers points of the angle
+    quivers_slices = get_quivers_slices(commands_list)
+    vector_size = FieldSlicer(netcdf_file, vector_size_field_name, commands_list)[
+        commands_list.current_time_value, commands_list.current_depth_value]
+    vector_ang = FieldSlicer(netcdf_file, vector_ang_field_name, commands_list, is_direction=True)[
+        (commands_list.current_time_value, commands_list.current_depth_value) + quivers_slices]
+
+    # converting the angle to radians from the latitude direction, in place, and projecting the sizes on it
+    quivers_vector_size = vector_size[quivers_slices]
+    np.deg2rad(vector_ang, out=vector_ang)
+    vector_ang += np.pi / 2
+    lat_component = quivers_vector_size * np.cos(vector_ang)
+    lon_component = np.sin(vector_ang, out=vector_ang)
+    lon_component *= quivers_vector_size
     return lat_component, lon_component, vector_size
 
 
@@ -124,34 +569,31 @@ def make_cartesian_components(netcdf_file, commands_list: MapCommandsList):
     :param netcdf_file: the netCDF file
     :param commands_list: an object from the MapCommandsList type that contains all the information we need to build the
     map.
-    :return: a vector containing the field's latitude, longitude and size components
+    :return: the field's latitude and longitude components at the quivers points, and the field's size as a lat-lon slab
+    of the current time and depth
 
-    about: extracts the cartesian data from a netcdf file , reorders them in a predefined order, and projects them to
-    latitude,longitude, and size
+    about: extracts the cartesian data of the current time and depth from a netcdf file, and projects them to
+    latitude,longitude, and size. The size is calculated into the buffer of one of the components, after the components
+    of every quiver_space-th point, where the quivers are drawn, are taken.
     """
     # getting the names of the size and angular vector fields as they are written in the netCDF file, from the info list
     lat_component_field_name = commands_list.info_list[commands_list.lat_component]
     lon_component_field_name = commands_list.info_list[commands_list.lon_component]
 
-    # getting the values of the fields from the netCDF file
-    lat_component = nfh.get_values(netcdf_file, lat_component_field_name)
-    lon_component = nfh.get_values(netcdf_file, lon_component_field_name)
-
-    # finding the order of the dimensions the fields depends on and arranging the fields's dimensions order to:
-    # time, depth, lat, lon
-    lat_component_field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, lat_component_field_name,
-                                                                     commands_list)
-    lon_component_field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, lon_component_field_name,
-                                                                     commands_list)
-    lat_component = arrange_fields(lat_component, commands_list, lat_component_field_indexes)
-    lon_component = arrange_fields(lon_component, commands_list, lon_component_field_indexes)
-    lat_component = np.array(lat_component)
-    lon_component = np.array(lon_component)
-
-    vector_size = np.sqrt(np.power(lat_component, 2) + np.power(lon_component, 2))
-    return lat_component, lon_component, vector_size
+    # reading only the slabs of the current time and depth of the fields
+    time_and_depth = commands_list.current_time_value, commands_list.current_depth_value
+    lat_component = FieldSlicer(netcdf_file, lat_component_field_name, commands_list)[time_and_depth]
+    lon_component = FieldSlicer(netcdf_file, lon_component_field_name, commands_list)[time_and_depth]
 
+    # taking the components of the quivers points, then calculating the size over the latitude component
+    quivers_slices = get_quivers_slices(commands_list)
+    quivers_lat_component = lat_component[quivers_slices].copy()
+    quivers_lon_component = lon_component[quivers_slices].copy()
+    vector_size = np.hypot(lat_component, lon_component, out=lat_component)
+    return quivers_lat_component, quivers_lon_component, vector_size
 
+
+@Instrumentation.timed_stage
 def arrange_fields(field, commands_list, field_indexes: FieldIndexes):
     """
     :param field: the field this function is going to arrange
@@ -159,63 +601,373 @@ def arrange_fields(field, commands_list, field_indexes: FieldIndexes):
      the map.
     :param field_indexes: an object that contains every dimension's index. The indexes are obtained from the field
      object in the netCDF, and not from the netCDF dimension objects's indexes
-    :return: the arranged field
+    :return: the arranged field, as a view of field
 
     about: this function arranges the data fields to be in order: time, depth, lat, lon, and creating a 1 sized time or
-    depth dimension if needed
+    depth dimension if needed. The dimensions are added and reordered on the existing buffer, so no copy of the field is
+    made.
     """
 
-    field = np.array(field)
+    field = np.asarray(field)
 
-    # splitting into cases depends on time or depth dependence. Adding to the  field a dummy dimension if needed to
-    # make them easier to use, and arranging the field with transpose from numpy.
+    # splitting into cases depends on time or depth dependence. Adding to the field a dummy dimension if needed to
+    # make them easier to use, and arranging the field with transpose from numpy. both of them return views.
     if commands_list.is_depends_on_time and commands_list.is_depends_on_depth:
-        field = field.transpose(field_indexes.time, field_indexes.depth, field_indexes.lat,
-                                field_indexes.lon)
+        field = field.transpose(field_indexes.time, field_indexes.depth, field_indexes.lat, field_indexes.lon)
     elif commands_list.is_depends_on_time and not commands_list.is_depends_on_depth:
-        field = [field]
-        field = np.array(field)
+        field = np.expand_dims(field, 0)
         field = field.transpose(int(field_indexes.time) + 1, 0, int(field_indexes.lat) + 1, int(field_indexes.lon) + 1)
     elif not commands_list.is_depends_on_time and commands_list.is_depends_on_depth:
-        field = [field]
-        field = np.array(field)
+        field = np.expand_dims(field, 0)
         field = field.transpose(0, int(field_indexes.depth) + 1, int(field_indexes.lat) + 1, int(field_indexes.lon) + 1)
     else:
-        field = [[field]]
-        field = np.array(field)
+        field = np.expand_dims(field, (0, 1))
         field = field.transpose(0, 1, int(field_indexes.lat) + 2, int(field_indexes.lon) + 2)
 
     return field
 
 
-def make_map_base(netcdf_file, commands_list: MapCommandsList):
+# a class that gives the lat-lon slab of a field for a time and depth, without arranging or reading all of the field
+class FieldSlicer:
+    netcdf_file: object  # the netCDF file
+    field_name: str  # the name of the field as it is written in the netCDF file
+    field_indexes: FieldIndexes  # the field's index for every dimension
+    map_domain: Optional[nfh.MapDomain]  # the part of the grid of the map and its level of detail
+    is_direction: bool  # if the field is a direction in degrees, that is averaged by its sine and cosine
+
+    def __init__(self, netcdf_file, field_name, commands_list, is_direction=False):
+        self.netcdf_file = netcdf_file
+        self.field_name = field_name
+        self.field_indexes = nfh.find_indexes_in_dimension_list(netcdf_file, field_name, commands_list)
+        self.map_domain = getattr(commands_list, 'map_domain', None)
+        self.is_direction = is_direction
+
+    def __getitem__(self, slab_index):
+        """
+        :param slab_index: a tuple of the time index and the depth index, and optionally the lat and lon slices
+        :return: the lat-lon slab of the field at that time and depth
+
+        call_example:
+        FieldSlicer(netcdf_file, 'msl', commands_list)[5, 0]
+        is the same as arrange_fields(all_msl_values, commands_list, field_indexes)[5][0], but reads only that slab.
+        FieldSlicer(netcdf_file, 'msl', commands_list)[5, 0, ::10, ::10]
+        reads only every 10th point of that slab
+        When commands_list has a map domain, the slab is of the map domain, and the lat and lon slices are of its cells.
+        """
+        if self.map_domain is None or self.map_domain.is_whole_grid():
+            return nfh.get_slab_values(self.netcdf_file, self.field_name, self.field_indexes, *slab_index)
+        values = nfh.get_domain_values(self.netcdf_file, self.field_name, self.field_indexes, self.map_domain,
+                                       *slab_index[:2], is_direction=self.is_direction)
+        return values[slab_index[2:]] if len(slab_index) > 2 else values
+
+
+# a class that reads the data of the next frames in a background thread, while the main thread draws the current frame.
+# The reader thread opens its own netCDF file, and puts the data of every frame, by the frames order, in a queue of
+# prefetch_depth frames. It waits when the queue is full, so it is never more than prefetch_depth frames ahead, and the
+# memory of the frames' data stays bounded. The main thread must not read from the netCDF files while the reader
+# thread runs, as the netCDF and HDF5 libraries are not thread safe.
+class FramePrefetcher:
+    commands_list: MapCommandsList  # a copy of the commands list, with the time and depth values of the frame being read
+    frames: list  # the (time value, depth value) of every frame, from get_frames_values()
+    frames_queue: queue.Queue  # the data of the frames that were read and not drawn yet, or the error of the reader
+    is_stopping: threading.Event  # set when the frames are not needed anymore
+    reader_thread: threading.Thread  # the thread that reads the frames
+
+    def __init__(self, commands_list: MapCommandsList, frames, prefetch_depth):
+        self.commands_list = copy.copy(commands_list)
+        self.frames = frames
+        self.frames_queue = queue.Queue(maxsize=prefetch_depth)
+        self.is_stopping = threading.Event()
+        self.reader_thread = threading.Thread(target=self.read_frames, daemon=True)
+        self.reader_thread.start()
+
+    def read_frames(self):
+        """
+        about: the reader thread. reading the data of every frame with read_map_data(), and putting it in the queue
+        """
+        try:
+            netcdf_file = nfh.open_netcdf(self.commands_list.netcdf_path)
+            try:
+                for time_value, depth_value in self.frames:
+                    self.commands_list.current_time_value = time_value
+                    self.commands_list.current_depth_value = depth_value
+                    if not self.put(read_map_data(netcdf_file, self.commands_list)):
+                        return
+            finally:
+                netcdf_file.close()
+        except Exception as error:
+            self.put(error)
+
+    def put(self, item):
+        """
+        :param item: the data of a frame, or an error
+        :return: True if the item was put in the queue, False if the frames are not needed anymore
+
+        about: waiting for room in the queue, while checking every 0.1 seconds whether the frames are still needed
+        """
+        while not self.is_stopping.is_set():
+            try:
+                self.frames_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self):
+        """
+        :return: the data of the next frame, from read_map_data(). an error of the reader thread is raised here
+        """
+        item = self.frames_queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        """
+        about: stopping the reader thread, and waiting for it to close its netCDF file
+        """
+        self.is_stopping.set()
+        self.reader_thread.join()
+
+
+@Instrumentation.timed_stage
+def make_map_base(netcdf_file, commands_list: MapCommandsList, ax=None):
     """
     :param netcdf_file: the netCDF file
     :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
      the map.
+    :param ax: the matplotlib axes the map is drawn on. defaults to pyplot's current axes
     :return: and the x and y axis for the map
 
-    about: this function makes the base of a map. It sets the size and edges, and creates coastlines
+    about: this function makes the base of a map. It sets the size and edges, and creates coastlines. The edges are the
+    corners in commands_list, or the edges of the grid if there are no corners. It also finds the map domain, the part
+    of the grid the map shows and its level of detail, and saves it to commands_list.map_domain for the fields that
+    are drawn on the map base, and the keywords of its Basemap to commands_list.map_properties.
     """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+
+    # getting the latitude and longitude vectors from the netCDF file. they are small, so they are read in full precision
+    lon = nfh.get_values(netcdf_file, commands_list.info_list[commands_list.lon], np.float64)
+    lat = nfh.get_values(netcdf_file, commands_list.info_list[commands_list.lat], np.float64)
 
-    # getting the latitude and longitude vectors from the netCDF file
-    lon = nfh.get_values(netcdf_file, commands_list.info_list[commands_list.lon])
-    lat = nfh.get_values(netcdf_file, commands_list.info_list[commands_list.lat])
+    # the part of the grid the map shows, in its level of detail
+    commands_list.map_domain, lon_min, lon_max, lat_min, lat_max = get_map_domain(commands_list, lat, lon, ax)
 
     # setting the temporary defaults to those values. they are already in the command list, just needs to get a value
-    lat_0 = lat.mean()
-    lon_0 = lon.mean()
-    lon_min = lon.min()
-    lon_max = lon.max()
-    lat_min = lat.min()
-    lat_max = lat.max()
-
-    # creating the base of the map
-    xx, yy = np.meshgrid(lon, lat)
-    m = Basemap(width=2000, height=2000, resolution=commands_list.resolution, projection=commands_list.projection,
-                lon_0=lon_0, lat_0=lat_0,
-                llcrnrlon=lon_min, urcrnrlon=lon_max, llcrnrlat=lat_min, urcrnrlat=lat_max)
-    xx, yy = m(xx, yy)
-    m.drawcoastlines()
+    lat_0 = (lat_min + lat_max) / 2 if has_map_corners(commands_list) else lat.mean()
+    lon_0 = (lon_min + lon_max) / 2 if has_map_corners(commands_list) else lon.mean()
+
+    # the coordinates of the map domain's cells
+    lat, lon = nfh.get_domain_coordinates(netcdf_file, commands_list.info_list[commands_list.lat],
+                                          commands_list.info_list[commands_list.lon], commands_list.map_domain)
+
+    # the corners always set the edges of the map, so Basemap gets no width and height, that it would ignore with a
+    # printed warning
+    commands_list.map_properties = dict(resolution=commands_list.resolution, projection=commands_list.projection,
+                                        lon_0=lon_0, lat_0=lat_0, llcrnrlon=lon_min, urcrnrlon=lon_max,
+                                        llcrnrlat=lat_min, urcrnrlat=lat_max)
+    return draw_map_base(commands_list.map_properties, lat, lon, ax)
+
+
+def draw_map_base(map_properties, lat, lon, ax):
+    """
+    :param map_properties: a dictionary of the keywords for Basemap
+    :param lat: the latitude vector of the map domain's cells
+    :param lon: the longitude vector of the map domain's cells
+    :param ax: the matplotlib axes the map is drawn on
+    :return: the x and y axis for the map
+
+    about: this function draws the coastlines of the map base, and projects the cells of the map domain on it
+    """
+    # creating the base of the map, or taking it from the cache if a base for the same domain was already made
+    m, xx, yy = get_cached_map_base(map_properties, lat, lon)
+    with Instrumentation.stage("drawcoastlines"):
+        m.drawcoastlines(ax=ax)
 
     return xx, yy
+
+
+def has_map_corners(commands_list: MapCommandsList):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
+     the map.
+    :return: True if the map is of the part of the grid between the corners in commands_list
+    """
+    return None not in [commands_list.lon_lower_left_corner, commands_list.lat_lower_left_corner,
+                        commands_list.lon_upper_right_corner, commands_list.lat_upper_right_corner]
+
+
+def get_map_domain(commands_list: MapCommandsList, lat, lon, ax):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
+     the map.
+    :param lat: the latitude vector of the grid
+    :param lon: the longitude vector of the grid
+    :param ax: the matplotlib axes the map is drawn on
+    :return: a MapDomain object of the part of the grid the map shows, in about one cell for every pixel of the axes,
+    and the edges of the map: lon_min, lon_max, lat_min, lat_max
+
+    about: finding the part of the grid between the corners of the map by binary search on the coordinates, so only it
+    is read from the file. A map that crosses the end of a global longitude vector reads two parts of it, its end and
+    its start. Then finding the level of detail of the map. When there are a few grid points for every pixel of the
+    axes, they are averaged into one cell. Up to lod_averaged_points points along each axis are read and averaged, and
+    coarser levels of detail read only every few points of the grid, so the netCDF file is read strided.
+
+    call_example:
+    get_map_domain(commands_list, lat, lon, ax) for a 0.1 degree global grid, without corners, on axes of 900 x 450
+    pixels
+    -> MapDomain(lat_slice=slice(None), lon_slices=[slice(None)], lat_block=4, lon_block=4), 0, 359.9, -90, 90
+    """
+    # the part of the grid between the corners
+    if has_map_corners(commands_list):
+        lat_min, lat_max = sorted([commands_list.lat_lower_left_corner, commands_list.lat_upper_right_corner])
+        lat_slice = nfh.find_index_range(lat, lat_min, lat_max)
+        lon_slices, lon_min, lon_max = nfh.find_lon_index_ranges(lon, commands_list.lon_lower_left_corner,
+                                                                 commands_list.lon_upper_right_corner)
+    else:
+        lat_slice, lon_slices = slice(None), [slice(None)]
+        lat_min, lat_max, lon_min, lon_max = lat.min(), lat.max(), lon.min(), lon.max()
+    lat_size = len(lat[lat_slice])
+    lon_size = sum(len(lon[lon_slice]) for lon_slice in lon_slices)
+    if commands_list.is_full_resolution:
+        return nfh.MapDomain(lat_slice, lon_slices), lon_min, lon_max, lat_min, lat_max
+
+    # the number of grid points in one pixel of the axes, along each axis
+    axes_extent = ax.get_window_extent()
+    lat_reduction = max(1, int(lat_size // max(1, axes_extent.height)))
+    lon_reduction = max(1, int(lon_size // max(1, axes_extent.width)))
+
+    # reading only every few points, so no more than lod_averaged_points points are averaged along each axis
+    lat_step = -(-lat_reduction // lod_averaged_points)
+    lon_step = -(-lon_reduction // lod_averaged_points)
+    if lat_step > 1:
+        lat_slice = slice(lat_slice.start, lat_slice.stop, lat_step)
+    if lon_step > 1:
+        lon_slices = [slice(lon_slice.start, lon_slice.stop, lon_step) for lon_slice in lon_slices]
+    return nfh.MapDomain(lat_slice, lon_slices, lat_reduction // lat_step, lon_reduction // lon_step), \
+        lon_min, lon_max, lat_min, lat_max
+
+
+def get_quivers_slices(commands_list: MapCommandsList):
+    """
+    :param commands_list: an object from the MapCommandsList type that contains all the information we need to build
+     the map.
+    :return: a tuple of the latitude slice and the longitude slice of the quivers points in the map's cells
+
+    about: quiver_space is in grid points, so in a lower level of detail the quivers are every fewer cells, and they
+    stay in the same distance from each other
+    """
+    lat_reduction, lon_reduction = commands_list.map_domain.get_reduction() if commands_list.map_domain is not None \
+        else (1, 1)
+    return (slice(None, None, max(1, commands_list.quiver_space // lat_reduction)),
+            slice(None, None, max(1, commands_list.quiver_space // lon_reduction)))
+
+
+def get_cached_map_base(map_properties, lat, lon):
+    """
+    :param map_properties: a dictionary of the keywords for Basemap
+    :param lat: the latitude vector
+    :param lon: the longitude vector
+    :return: the Basemap object, and the x and y axis for the map
+
+    about: this function gets the Basemap object and the projected lat-lon grid from the in-process cache, or the
+    on-disk cache. If they are not in any of them, it creates them and saves them in both caches. Creating a Basemap
+    object with high resolution coastlines takes seconds, so maps of the same domain should reuse it. Both caches are
+    bounded, by max_map_bases and max_map_base_cache_bytes, and drop their least recently used map bases.
+    """
+    key = get_map_cache_key(map_properties, lat, lon)
+    if key in map_base_cache:
+        map_base_cache.move_to_end(key)
+        return map_base_cache[key]
+
+    # looking for the map base in the on-disk cache. the modification time of a file is the last time it was used, for
+    # evict_map_base_cache()
+    cache_file_name = None
+    if map_base_cache_directory is not None:
+        cache_file_name = os.path.join(map_base_cache_directory, key + ".pickle")
+        if os.path.isfile(cache_file_name):
+            with open(cache_file_name, 'rb') as f, Instrumentation.stage("load_map_base"):
+                map_base = pickle.load(f)
+            os.utime(cache_file_name)
+            return add_to_map_base_cache(key, map_base)
+
+    # creating the base of the map. Basemap is imported only here, as importing it takes about a second, and the map
+    # bases of the caches don't need it to be imported first
+    with Instrumentation.stage("Basemap", resolution=map_properties["resolution"]):
+        from mpl_toolkits.basemap import Basemap
+        xx, yy = np.meshgrid(lon, lat)
+        m = Basemap(**map_properties)
+        xx, yy = m(xx, yy)
+    map_base = add_to_map_base_cache(key, (m, xx, yy))
+
+    # saving the map base to the on-disk cache. writing to a temporary file first, so other runs never read half of it,
+    # and making room for it in the cache before it is moved there
+    if cache_file_name is not None:
+        os.makedirs(map_base_cache_directory, exist_ok=True)
+        temporary_file_name = cache_file_name + "." + str(os.getpid()) + ".tmp"
+        with open(temporary_file_name, 'wb') as f:
+            pickle.dump(map_base, f)
+        cache_file_bytes = os.path.getsize(temporary_file_name)
+        if cache_file_bytes > max_map_base_cache_bytes:
+            os.remove(temporary_file_name)
+        else:
+            evict_map_base_cache(cache_file_bytes)
+            os.replace(temporary_file_name, cache_file_name)
+    return map_base
+
+
+def add_to_map_base_cache(key, map_base):
+    """
+    :param key: the key of the map base, from get_map_cache_key()
+    :param map_base: the Basemap object, and the x and y axis for the map
+    :return: map_base
+
+    about: adding the map base to the in-process cache, and dropping the least recently used map bases, until there
+    are at most max_map_bases
+    """
+    map_base_cache[key] = map_base
+    while len(map_base_cache) > max_map_bases:
+        map_base_cache.popitem(last=False)
+    return map_base
+
+
+def evict_map_base_cache(needed_bytes):
+    """
+    :param needed_bytes: the size of the file that is about to be saved to the on-disk cache of the map bases
+
+    about: deleting the least recently used files of the on-disk cache of the map bases, until there is room for
+    needed_bytes in max_map_base_cache_bytes. A file that another process has open can't be deleted on windows, and is
+    left for a later run
+    """
+    cache_files = [os.path.join(map_base_cache_directory, file_name)
+                   for file_name in os.listdir(map_base_cache_directory) if file_name.endswith(".pickle")]
+    cache_files.sort(key=os.path.getmtime)
+    cache_bytes = sum(os.path.getsize(cache_file) for cache_file in cache_files)
+    for cache_file in cache_files:
+        if cache_bytes + needed_bytes <= max_map_base_cache_bytes:
+            break
+        try:
+            cache_file_bytes = os.path.getsize(cache_file)
+            os.remove(cache_file)
+        except OSError:
+            continue
+        cache_bytes -= cache_file_bytes
+
+
+def get_map_cache_key(map_properties, lat, lon):
+    """
+    :param map_properties: a dictionary of the keywords for Basemap
+    :param lat: the latitude vector
+    :param lon: the longitude vector
+    :return: a string that is the same only for the same projection, resolution, corners and lat-lon vectors
+
+    about: this function makes the key of a map base in the map base caches
+    """
+    key_hash = hashlib.sha1(repr(sorted(map_properties.items())).encode())
+    for coordinate_vector in (lat, lon):
+        coordinate_vector = np.ascontiguousarray(coordinate_vector)
+        key_hash.update(str(coordinate_vector.dtype).encode() + str(coordinate_vector.shape).encode())
+        key_hash.update(coordinate_vector.tobytes())
+    return key_hash.hexdigest()
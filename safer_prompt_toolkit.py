@@ -1,6 +1,14 @@
+import sys
 import prompt_toolkit
 from prompt_toolkit import completion, validation, document
-from prompt_toolkit.output.win32 import NoConsoleScreenBufferError
+
+# the error prompt_toolkit raises when there is no console to prompt in. it is defined only on windows, and importing
+# prompt_toolkit.output.win32 fails on any other platform
+if sys.platform == "win32":
+    from prompt_toolkit.output.win32 import NoConsoleScreenBufferError
+else:
+    class NoConsoleScreenBufferError(Exception):
+        pass
 
 
 def prompt(message, max_failcase_completion_lines=3, max_chars_in_completion_line=150, force_fail_safe=False,
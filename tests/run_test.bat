@@ -1,3 +1,3 @@
-
 python ../main.py -i < test.txt
+python ../main.py -j job.json
 PAUSE
\ No newline at end of file